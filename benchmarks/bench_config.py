@@ -0,0 +1,83 @@
+"""
+Measures the startup cost of loading the Stack configuration in a fresh
+interpreter, both cold (no compiled snapshot) and warm (snapshot present).
+
+Usage: python benchmarks/bench_config.py [--services=N] [--runs=N]
+"""
+import argparse
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import yaml
+
+LOAD = (
+    "from stack.config import StackConfig;"
+    "config = StackConfig.load({root!r});"
+    "assert len(config.apps) == {services}"
+)
+
+
+def make_stack(root, services):
+    compose = {"version": "2.1", "services": {}}
+    apps = {}
+    for i in range(services):
+        name = "app{}".format(i)
+        compose["services"][name] = {
+            "container_name": "{}-stack".format(name),
+            "build": "./overrides/{}".format(name),
+            "image": "stack/{}".format(name),
+            "volumes": ["./apps/{0}/:/{0}".format(name)] * 4,
+            "environment": ["VAR{}=value".format(j) for j in range(40)],
+            "ports": ["{}:8000".format(8000 + i)],
+            "healthcheck": {"test": ["CMD", "curl", "-f", "http://localhost:8000"]},
+        }
+        apps[name] = {
+            "repository": "https://github.com/organization/{}.git".format(name),
+            "branch": "development",
+        }
+
+    with open(os.path.join(root, "docker-compose.yml"), "w") as f:
+        yaml.dump(compose, f)
+    with open(os.path.join(root, "stack.yml"), "w") as f:
+        yaml.dump({"stack": {"name": "bench", "apps": apps}}, f)
+
+
+def time_load(root, services):
+    start = time.perf_counter()
+    subprocess.run(
+        [sys.executable, "-c", LOAD.format(root=root, services=services)], check=True
+    )
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--services", type=int, default=20)
+    parser.add_argument("--runs", type=int, default=10)
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp()
+    try:
+        make_stack(root, args.services)
+        cache = os.path.join(root, ".stack")
+
+        cold, warm = [], []
+        for _ in range(args.runs):
+            shutil.rmtree(cache, ignore_errors=True)
+            cold.append(time_load(root, args.services))
+            warm.append(time_load(root, args.services))
+
+        print("services: {}, runs: {}".format(args.services, args.runs))
+        print("cold (YAML parse): {:.1f} ms".format(min(cold) * 1000))
+        print("warm (snapshot):   {:.1f} ms".format(min(warm) * 1000))
+
+    finally:
+        shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Compares creating a Docker client per helper call, as commands used to,
+with the shared client, against a fake Docker daemon on a local socket. The
+shared client pins the API version, so it saves the version request each
+new client makes. The SDK keeps a connection pool per URL, so calls for
+different containers still open a connection each.
+
+Usage: python benchmarks/bench_docker.py [--calls=N] [--threads=N] [--latency=ms]
+"""
+import argparse
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler
+
+import docker
+
+from stack import client
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        return "fake"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        with self.server.lock:
+            self.server.requests += 1
+
+        # Pretend to be a daemon doing some work
+        time.sleep(self.server.latency)
+
+        if self.path.endswith("/version"):
+            body = {"ApiVersion": "1.41", "Version": "20.10.0"}
+        else:
+            body = {"Id": "abc", "State": {"Status": "running", "Running": True}}
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+
+class FakeDocker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, path, latency):
+        super().__init__(path, Handler)
+        self.latency = latency
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.connections = 0
+
+
+def per_call(name):
+    """What every command and helper used to do"""
+    docker_client = docker.from_env()
+    docker_client.containers.get(name)
+    docker_client.close()
+
+
+def shared(name):
+    client.get_docker_client().containers.get(name)
+
+
+def measure(server, label, call, calls, threads):
+    server.requests = server.connections = 0
+    client.reset()
+
+    start = time.monotonic()
+    with ThreadPoolExecutor(max_workers=threads) as executor:
+        list(executor.map(call, ["app{}".format(i) for i in range(calls)]))
+    elapsed = time.monotonic() - start
+
+    print(
+        "{:<10} {:>8.1f} ms  {:>5} requests  {:>5} connections".format(
+            label, elapsed * 1000, server.requests, server.connections
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--calls", type=int, default=500)
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=1.0)
+    args = parser.parse_args()
+
+    directory = tempfile.mkdtemp()
+    server = FakeDocker(os.path.join(directory, "docker.sock"), args.latency / 1000)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    os.environ["DOCKER_HOST"] = "unix://" + server.server_address
+
+    try:
+        for threads in (1, args.threads):
+            print("{} calls, {} thread(s)".format(args.calls, threads))
+            measure(server, "per call", per_call, args.calls, threads)
+            measure(server, "shared", shared, args.calls, threads)
+
+    finally:
+        client.reset()
+        server.shutdown()
+        server.server_close()
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Pushes mixed stdout/stderr output through Stack.run and compares it with
+the previous select/readline implementation.
+
+Usage: python benchmarks/bench_run.py [--megabytes=N] [--verbose]
+"""
+import argparse
+import io
+import logging
+import select
+import subprocess
+import sys
+import time
+
+from stack import process
+
+# Writes alternating 100 byte lines to stdout and stderr
+CHILD = """
+import sys
+line = b"x" * 99 + b"\\n"
+block = line * 1000
+out, err = sys.stdout.buffer, sys.stderr.buffer
+for i in range({blocks}):
+    (out if i % 2 else err).write(block)
+"""
+
+
+def readline_run(args):
+    """The original implementation of Stack.run, for comparison"""
+    child = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    log_level = {child.stdout: logging.DEBUG, child.stderr: logging.ERROR}
+
+    def check_io():
+        ready_to_read = select.select([child.stdout, child.stderr], [], [], 1000)[0]
+        for io_ in ready_to_read:
+            line = io_.readline()
+            if len(line) > 0:
+                process.logger.log(log_level[io_], line[:-1].decode())
+
+    while child.poll() is None:
+        check_io()
+
+    check_io()
+
+    return child.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--megabytes", type=int, default=100)
+    parser.add_argument("--verbose", action="store_true")
+    args = parser.parse_args()
+
+    # Log everything into memory so the terminal is not the bottleneck
+    process.logger.addHandler(logging.StreamHandler(io.StringIO()))
+    process.logger.propagate = False
+    process.logger.setLevel(logging.DEBUG if args.verbose else logging.ERROR)
+
+    command = [sys.executable, "-c", CHILD.format(blocks=args.megabytes * 10)]
+
+    print(
+        "{} MB of mixed output, {} logging".format(
+            args.megabytes, "debug" if args.verbose else "error"
+        )
+    )
+    for name, run in (("readline", readline_run), ("chunked", process.run)):
+        start = time.perf_counter()
+        run(command)
+        elapsed = time.perf_counter() - start
+        print(
+            "{:>10}: {:.2f} s ({:.0f} MB/s)".format(
+                name, elapsed, args.megabytes / elapsed
+            )
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""
+Compares adding the subtrees of several apps with one fetch after another,
+as 'stack update' used to, with fetching them all at once into local refs
+first, against local bare repositories. Each fetch can be delayed to stand
+in for the network.
+
+Usage: python benchmarks/bench_subtree.py [--apps=N] [--files=N] [--latency=ms]
+"""
+import argparse
+import logging
+import os
+import shutil
+import subprocess
+import tempfile
+import time
+
+from stack import subtree
+
+# Runs a git service after a delay, for the ext:: transport
+SLOW_SERVICE = """#!/bin/sh
+sleep {latency}
+exec "$@"
+"""
+
+
+def git(*args, cwd=None):
+    subprocess.check_call(
+        ("git",) + args,
+        cwd=cwd,
+        stdout=subprocess.DEVNULL,
+        stderr=subprocess.DEVNULL,
+    )
+
+
+def make_remote(directory, app, files):
+    """Creates a bare repository with a branch of files"""
+    work = os.path.join(directory, "work", app)
+    os.makedirs(work)
+    git("init", "--initial-branch=development", cwd=work)
+    for i in range(files):
+        with open(os.path.join(work, "file{}.py".format(i)), "w") as f:
+            f.write("# {} {}\n".format(app, i) * 100)
+    git("add", ".", cwd=work)
+    git("commit", "-m", "Initial", cwd=work)
+
+    path = os.path.join(directory, app + ".git")
+    git("clone", "--bare", work, path)
+    return path
+
+
+def make_stack(directory, name):
+    path = os.path.join(directory, name)
+    os.makedirs(path)
+    git("init", cwd=path)
+    git("commit", "--allow-empty", "-m", "Stack", cwd=path)
+    return path
+
+
+def serial(stack, remotes):
+    """What 'stack update' used to do"""
+    for app, url in remotes.items():
+        git(
+            "subtree",
+            "add",
+            "--prefix=apps/{}".format(app),
+            url,
+            "development",
+            "--squash",
+            cwd=stack,
+        )
+
+
+def prefetched(stack, remotes):
+    cwd = os.getcwd()
+    os.chdir(stack)
+    try:
+        fetched = subtree.fetch_many(
+            {app: (url, "development") for app, url in remotes.items()}
+        )
+        for app in remotes:
+            if app in fetched:
+                git(
+                    "subtree",
+                    "add",
+                    "--prefix=apps/{}".format(app),
+                    subtree.get_ref(app),
+                    "--squash",
+                )
+
+    finally:
+        os.chdir(cwd)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--apps", type=int, default=15)
+    parser.add_argument("--files", type=int, default=200)
+    parser.add_argument("--latency", type=float, default=500)
+    args = parser.parse_args()
+
+    # Leave out the output of the fetches
+    logging.getLogger("stack").setLevel(logging.CRITICAL)
+
+    directory = tempfile.mkdtemp()
+    environ = dict(os.environ)
+    os.environ.update(
+        {
+            "GIT_AUTHOR_NAME": "Stack",
+            "GIT_AUTHOR_EMAIL": "stack@example.com",
+            "GIT_COMMITTER_NAME": "Stack",
+            "GIT_COMMITTER_EMAIL": "stack@example.com",
+            "GIT_ALLOW_PROTOCOL": "ext:file",
+        }
+    )
+
+    try:
+        # Reach the repositories through a slow transport
+        service = os.path.join(directory, "slow-service")
+        with open(service, "w") as f:
+            f.write(SLOW_SERVICE.format(latency=args.latency / 1000))
+        os.chmod(service, 0o755)
+
+        remotes = {}
+        for i in range(args.apps):
+            app = "app{}".format(i)
+            path = make_remote(directory, app, args.files)
+            remotes[app] = "ext::{} %S {}".format(service, path)
+
+        print(
+            "{} apps, {} files each, {:.0f} ms per fetch".format(
+                args.apps, args.files, args.latency
+            )
+        )
+        for label, update in (("serial", serial), ("prefetched", prefetched)):
+            stack = make_stack(directory, label)
+            start = time.monotonic()
+            update(stack, remotes)
+            print("{:<12} {:>8.1f} s".format(label, time.monotonic() - start))
+
+    finally:
+        os.environ.clear()
+        os.environ.update(environ)
+        shutil.rmtree(directory)
+
+
+if __name__ == "__main__":
+    main()
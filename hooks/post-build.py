@@ -7,5 +7,14 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the name of the app being built, or 'all' if the whole stack is being built
-app = sys.argv[1]
+
+def run(app):
+    """
+    Called after an app's image is built
+    :param app: The name of the app that was built
+    """
+    pass
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -7,5 +7,14 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the app
-app = sys.argv[1]
+
+def run(app):
+    """
+    Called after an app's image is removed
+    :param app: The app
+    """
+    pass
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -7,8 +7,15 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the app
-app = sys.argv[1]
 
-# Get the path to the app's repo
-repo = sys.argv[2]
+def run(app, repo):
+    """
+    Called after an app's repository is cloned
+    :param app: The app
+    :param repo: The path to the app's repo
+    """
+    pass
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -7,5 +7,14 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the name of the app being built
-app = sys.argv[1]
+
+def run(app):
+    """
+    Called before an app's image is built
+    :param app: The name of the app being built
+    """
+    pass
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -2,6 +2,7 @@
 # coding: utf-8
 
 import os
+import sys
 
 from stack.app import Stack
 
@@ -9,5 +10,17 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the secrets file
-path = os.path.join(Stack.get_stack_root(), ".env")
+
+def run(app):
+    """
+    Called before the secrets are fetched
+    :param app: The app, or 'stack'
+    """
+
+    # Get the secrets file
+    path = os.path.join(Stack.get_stack_root(), ".env")
+    logger.debug("Secrets file: {}".format(path))
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
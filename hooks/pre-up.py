@@ -7,5 +7,14 @@ import logging
 
 logger = logging.getLogger("stack")
 
-# Get the app
-app = sys.argv[1]
+
+def run(app):
+    """
+    Called before the app, or the whole stack, is brought up
+    :param app: The app, or 'stack'
+    """
+    pass
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
@@ -1,11 +1,17 @@
+import itertools
 import os
-from docker import errors as docker_errors
-import re
 import subprocess
-import yaml
-import mysql.connector
-import select
-from logging import DEBUG, ERROR
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from stack import client
+from stack import hooks
+from stack import logs
+from stack import process
+from stack import readiness
+from stack import subtree
+from stack.config import StackConfig
+from stack.fingerprint import DockerIgnore, Manifest, fingerprint_tree, hash_file
 
 import logging
 
@@ -41,6 +47,35 @@ class Stack:
 
         return valid
 
+    @staticmethod
+    def check_git(cwd):
+        """
+        Checks to ensure the Stack is within a git working copy
+        :param cwd: Current working directory
+        :type cwd: String
+        :return: Whether git commands can be run
+        :rtype: Boolean
+        """
+        try:
+            subprocess.check_output(
+                ["git", "rev-parse", "--is-inside-work-tree"],
+                cwd=cwd,
+                stderr=subprocess.STDOUT,
+            )
+            return True
+
+        except (OSError, subprocess.CalledProcessError):
+            return False
+
+    @staticmethod
+    def load_config():
+        """
+        Get the parsed configuration for the stack. Files are only parsed
+        again if they have changed since the last time they were loaded.
+        :rtype: StackConfig
+        """
+        return StackConfig.load(Stack.get_stack_root())
+
     @staticmethod
     def get_config(property):
         """
@@ -49,39 +84,27 @@ class Stack:
         :return:
         """
 
-        # Get the path to the config.
-        stack_file = os.path.join(Stack.get_stack_root(), "stack.yml")
-
-        # Parse the yaml.
-        if os.path.exists(stack_file):
-            with open(stack_file, "r") as f:
-                config = yaml.load(f, Loader=yaml.FullLoader)
-
-                # Get the value.
-                value = config["stack"].get(property)
-                if value is not None:
+        # Get the config.
+        config = Stack.load_config()
+        if config.stack is None:
+            logger.error("Stack configuration file does not exist!")
+            return None
 
-                    return value
+        # Get the value.
+        value = config.get(property)
+        if value is not None:
 
-                else:
-                    logger.error("Stack property '{}' does not exist!".format(property))
-                    return None
+            return value
 
         else:
-            logger.error("Stack configuration file does not exist!")
+            logger.error("Stack property '{}' does not exist!".format(property))
             return None
 
     @staticmethod
     def get_app_config(app, property):
 
-        try:
-            # Get the config.
-            apps_dict = Stack.get_config("apps")
-
-            return apps_dict[app][property]
-
-        except KeyError:
-            return None
+        # Get the config.
+        return Stack.load_config().get_app_config(app, property)
 
     @staticmethod
     def get_secrets_config(property):
@@ -98,75 +121,135 @@ class Stack:
     @staticmethod
     def hook(step, app="stack", arguments=None):
         """
-        Check for a script for the given hook and runs it.
+        Check for a script for the given hook and runs it. If in-process hooks
+        are enabled, scripts defining a run() function are imported once and
+        called directly, and other scripts run in a subprocess.
         :param step: The name of the event, and the name of the hook script
         :param app: The app, if any, the event is for.
         :param arguments: Any additional arguments related to the event to
          be passed to the hook
-        :return: None
+        :return: The exit code of the hook, or 0 if there is none
+        :rtype: int
         """
 
-        # Get the path to the hooks directory.
-        hooks_dir = os.path.join(Stack.get_stack_root(), "hooks")
-        script_file = os.path.join(hooks_dir, "{}.py".format(step))
+        # Get the hooks directory, listed only once.
+        index = hooks.HookIndex.load(os.path.join(Stack.get_stack_root(), "hooks"))
+        script_file = index.get(step)
 
         # Check it.
-        logger.debug("Looking for hook: {}".format(script_file))
-        if os.path.exists(script_file):
+        if script_file is None:
+            logger.debug("(stack) No script exists for hook '{}'".format(step))
+            return 0
+
+        # Add the app, if any.
+        args = [app] if app is not None else []
+        if arguments is not None:
+            args.extend(arguments)
+
+        # Skip it if none of its declared inputs changed since it last succeeded
+        paths = Stack.get_hook_inputs(step, app)
+        if paths is not None:
+            manifest = Manifest.load(
+                os.path.join(Stack.get_stack_root(), ".stack", "hooks.json")
+            )
+            key = "{} {}".format(step, app)
+            record = manifest.get(key) or {}
+            fingerprint, files = hooks.fingerprint_inputs(
+                Stack.get_stack_root(),
+                paths,
+                record.get("files"),
+                {"arguments": args, "script": hash_file(script_file)},
+            )
+
+            if record.get("fingerprint") == fingerprint:
+                logger.info(
+                    "({}) Inputs of hook '{}' unchanged, skipping"
+                    " (saved {:.1f}s)".format(app, step, record.get("duration", 0))
+                )
+                return 0
 
-            # Build the command
-            command = ["python", script_file]
+        start = time.monotonic()
 
-            # Add the app, if any.
-            if app is not None:
-                command.append(app)
+        # Call it directly, if possible.
+        entry_point = None
+        if Stack.load_config().get("in-process-hooks"):
+            entry_point = index.get_entry_point(step)
 
-            if arguments is not None:
-                command.extend(arguments)
+        if entry_point is not None:
+            logger.debug("Running hook in-process: {} {}".format(step, args))
+            code = hooks.call(step, entry_point, args)
 
+        else:
             # Call the file.
+            command = ["python", script_file] + args
             logger.debug("Running hook: {}".format(command))
-            Stack.run(command)
+            code = Stack.run(command)
+
+        # Record what it ran with
+        if paths is not None and code == 0:
+            manifest.set(
+                key,
+                {
+                    "fingerprint": fingerprint,
+                    "files": files,
+                    "duration": time.monotonic() - start,
+                },
+            )
 
-        else:
-            logger.error("(stack) No script exists for hook '{}'".format(step))
+        return code
+
+    @staticmethod
+    def get_hook_inputs(step, app):
+        """
+        Returns the paths the hook declares as its inputs in the 'hooks'
+        section of stack.yml, with '{app}' replaced by the app
+        :param step: The name of the hook
+        :param app: The app the hook is run for
+        :return: The paths, or None if the hook declares no inputs
+        :rtype: list
+        """
+        hook = (Stack.load_config().get("hooks") or {}).get(step) or {}
+        if hook.get("inputs") is None:
+            return None
+
+        return [path.replace("{app}", str(app)) for path in hook["inputs"]]
 
     @staticmethod
     def get_stack_root():
         return os.getcwd()
 
+    @staticmethod
+    def get_docker_client():
+        """
+        Returns the Docker client shared by the whole process, configured
+        by the optional 'docker' section of stack.yml
+        :rtype: docker.DockerClient
+        """
+        return client.get_docker_client(Stack.load_config().get("docker"))
+
     @staticmethod
     def run(args, **kwargs):
         """
         Variant of subprocess.call that accepts a logger instead of stdout/stderr,
         and logs stdout messages via logger.debug and stderr messages via
-        logger.error.
+        logger.error. Pass passthrough=True to have the child write to the
+        terminal directly instead.
         """
-        child = subprocess.Popen(
-            args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs
-        )
-
-        log_level = {child.stdout: DEBUG, child.stderr: ERROR}
+        return process.run(args, **kwargs)
 
-        def check_io():
-            ready_to_read = select.select([child.stdout, child.stderr], [], [], 1000)[0]
-            for io in ready_to_read:
-                line = io.readline()
-                if len(line) > 0:
-                    logger.log(log_level[io], line[:-1].decode())
-
-        # keep checking stdout/stderr until the child exits
-        while child.poll() is None:
-            check_io()
-
-        check_io()  # check again to catch anything after the process exits
-
-        return child.wait()
+    @staticmethod
+    def run_many(commands, concurrency=None, **kwargs):
+        """
+        Runs (name, args) commands concurrently, logging their output with a
+        prefix per command, and returns a Result with the exit code and
+        duration of each.
+        """
+        return process.run_many(commands, concurrency=concurrency, **kwargs)
 
 
 class App:
     @staticmethod
-    def check(docker_client, app=None):
+    def check(app=None):
 
         if app is not None:
 
@@ -188,7 +271,7 @@ class App:
             valid = True
             for app in App.get_apps():
 
-                valid = valid and App.check(docker_client, app)
+                valid = valid and App.check(app)
 
             return valid
 
@@ -205,38 +288,207 @@ class App:
         return built_apps
 
     @staticmethod
-    def build(app):
+    def build(app, prefix=None):
+        """
+        Builds the app's image, running its pre-build and post-build hooks.
+        The build is skipped when the build context is unchanged since the
+        existing local image was built.
+        :param app: The app to build
+        :param prefix: A prefix to add to the lines of build output
+        :return: Whether the build succeeded
+        :rtype: bool
+        """
 
         # Check context and build.
         if App.check_build_context(app):
 
+            # Check whether anything changed since the last build
+            manifest = App.get_build_manifest()
+            record = manifest.get(app) or {}
+            fingerprint, files = App.get_build_fingerprint(app, record.get("files"))
+
+            image_id = App.get_image_id(app)
+            if (
+                image_id is not None
+                and record.get("fingerprint") == fingerprint
+                and record.get("image") == image_id
+            ):
+                logger.info("({}) Build context unchanged, skipping".format(app))
+                return True
+
             # Run the pre-build hook, if any
             Stack.hook("pre-build", app)
 
             # Capture and redirect output.
             logger.debug('Running "docker-compose build {}"'.format(app))
 
-            Stack.run(["docker-compose", "build", app])
+            code = Stack.run(["docker-compose", "build", app], prefix=prefix)
 
             # Run the pre-build hook, if any
             Stack.hook("post-build", app)
+
+            # Record what was built
+            if code == 0:
+                manifest.set(
+                    app,
+                    {
+                        "fingerprint": fingerprint,
+                        "image": App.get_image_id(app),
+                        "files": files,
+                    },
+                )
+
+            return code == 0
+
         else:
             logger.error("({}) Build context is invalid, cannot build...".format(app))
+            return False
+
+    @staticmethod
+    def get_build_manifest():
+        return Manifest.load(
+            os.path.join(Stack.get_stack_root(), ".stack", "builds.json")
+        )
+
+    @staticmethod
+    def get_build_fingerprint(app, previous=None):
+        """
+        Fingerprints the app's build context, leaving out anything matched by
+        its .dockerignore, along with the Dockerfile and build arguments
+        :param app: The app
+        :param previous: The files recorded for the previous fingerprint
+        :return: The fingerprint and the files it covers
+        :rtype: tuple
+        """
+        service = Stack.load_config().get_service(app)
+        context = os.path.normpath(
+            os.path.join(Stack.get_stack_root(), service.build_dir)
+        )
+        build = service.build if type(service.build) is dict else {}
+
+        # The Dockerfile is always sent, even if ignored or outside the context
+        dockerfile = os.path.join(context, service.dockerfile)
+        extra = {
+            "dockerfile": hash_file(dockerfile) if os.path.isfile(dockerfile) else None,
+            "args": build.get("args"),
+            "target": build.get("target"),
+            "image": service.image,
+        }
+
+        return fingerprint_tree(
+            context,
+            DockerIgnore.from_file(os.path.join(context, ".dockerignore")),
+            previous,
+            extra,
+        )
+
+    @staticmethod
+    def get_image_id(app):
+        from docker import errors as docker_errors
+
+        image = App.get_image_name(app)
+        if not image:
+            return None
+
+        try:
+            return Stack.get_docker_client().images.get(image).id
+
+        except docker_errors.ImageNotFound:
+            return None
+
+    @staticmethod
+    def build_many(apps, concurrency=None):
+        """
+        Builds the apps concurrently. An app is only built once the apps it
+        depends on, or whose images it is based on, have been built.
+        :param apps: The apps to build
+        :param concurrency: How many builds may run at once
+        :return: Whether all builds succeeded
+        :rtype: bool
+        """
+        apps = list(apps)
+        dependencies = {app: App.get_build_dependencies(app, apps) for app in apps}
+        colors = dict(zip(apps, itertools.cycle(process.PREFIX_COLORS)))
+
+        def build(app):
+            return App.build(app, prefix=process.get_prefix(app, colors[app]))
+
+        results = process.run_graph(apps, dependencies, build, concurrency)
+
+        # Summarize
+        rows = []
+        for app in apps:
+            result = results[app]
+            if result.code is None:
+                rows.append(["({})".format(app), "-", "skipped"])
+            else:
+                rows.append(
+                    [
+                        "({})".format(app),
+                        "{:.1f}s".format(result.duration),
+                        "built" if result.code == 0 else "failed",
+                    ]
+                )
+
+        for line in process.format_table(["App", "Time", "Result"], rows):
+            logger.info(line)
+
+        return all(result.code == 0 for result in results.values())
+
+    @staticmethod
+    def get_build_dependencies(app, apps):
+        """
+        Returns which of the given apps must be built before this app: those
+        it depends on and those whose images its Dockerfile is based on
+        :param app: The app
+        :param apps: The apps being built
+        :rtype: set
+        """
+        config = Stack.load_config()
+        service = config.get_service(app)
+        dependencies = set(d for d in service.depends_on if d in apps)
+
+        def repository(image):
+
+            # Strip the tag, but not a registry port
+            name, _, tag = image.rpartition(":")
+            return name if name and "/" not in tag else image
+
+        # Check the images the Dockerfile builds from
+        dockerfile = os.path.join(
+            Stack.get_stack_root(), service.build_dir, service.dockerfile
+        )
+        bases = set()
+        try:
+            with open(dockerfile, "r") as f:
+                for line in f:
+                    words = [w for w in line.split() if not w.startswith("--")]
+                    if len(words) > 1 and words[0].upper() == "FROM":
+                        bases.add(repository(words[1]))
+
+        except OSError:
+            pass
+
+        for other in apps:
+            image = config.get_service(other).image
+            if other != app and image and repository(image) in bases:
+                dependencies.add(other)
+
+        return dependencies
 
     @staticmethod
     def get_build_dir(app):
 
         # Get the path to the override directory
-        build_config = App.get_config(app, "build")
+        service = Stack.load_config().get_service(app)
+        if service is None:
+            return None
 
-        # Check for a dict
-        if build_config and type(build_config) is dict:
-            return build_config.get("context")
-        else:
-            return build_config
+        return service.build_dir
 
     @staticmethod
-    def check_running(docker_client, app):
+    def check_running(app, snapshot=None):
+        from docker import errors as docker_errors
 
         # Get the container name.
         name = App.get_container_name(app)
@@ -247,27 +499,31 @@ class App:
             return True
 
         # Fetch it.
-        try:
-            logger.debug("({}) Attempting to fetch container".format(app))
-
-            container = docker_client.containers.get(name)
+        logger.debug("({}) Attempting to fetch container".format(app))
+        if snapshot is not None:
+            container = snapshot.get_container(name)
+            status = container.status if container is not None else None
 
-            logger.info(
-                "({}) Container found with status '{}'".format(app, container.status)
-            )
+        else:
+            try:
+                status = Stack.get_docker_client().containers.get(name).status
 
-            return container.status == "running"
+            except docker_errors.NotFound:
+                status = None
 
-        except docker_errors.NotFound:
+        if status is None:
             logger.warning(
                 "({}) Container is not running, ensure all containers"
                 " are running".format(app)
             )
+            return False
 
-        return False
+        logger.info("({}) Container found with status '{}'".format(app, status))
+
+        return status == "running"
 
     @staticmethod
-    def clean_images(docker_client, app=None):
+    def clean_images(app=None):
 
         # Determine what to clean
         apps = [app] if app is not None else App.get_apps()
@@ -278,7 +534,7 @@ class App:
             # Ensure it's a built app.
             if App.get_config(app_to_clean, "build") is not None:
 
-                if App.check_docker_images(docker_client, app_to_clean, external=False):
+                if App.check_docker_images(app_to_clean, external=False):
 
                     # Get the docker image name.
                     image_name = App.get_image_name(app_to_clean)
@@ -287,7 +543,9 @@ class App:
                     Stack.hook("pre-clean")
 
                     # Remove it.
-                    docker_client.images.remove(image=image_name, force=True)
+                    Stack.get_docker_client().images.remove(
+                        image=image_name, force=True
+                    )
 
                     # Run the post-clean hook, if any
                     Stack.hook("post-clean")
@@ -305,7 +563,8 @@ class App:
                 )
 
     @staticmethod
-    def check_docker_images(docker_client, app, external=False):
+    def check_docker_images(app, external=False, snapshot=None):
+        from docker import errors as docker_errors
 
         # Check the testing image.
         image = App.get_image_name(app)
@@ -315,7 +574,12 @@ class App:
             logger.debug(
                 "({}) Looking for docker image '{}' locally".format(app, image)
             )
-            docker_client.images.get(image)
+            if snapshot is None:
+                Stack.get_docker_client().images.get(image)
+
+            elif not snapshot.has_image(image):
+                raise docker_errors.ImageNotFound(image)
+
             return True
 
         except docker_errors.ImageNotFound:
@@ -335,7 +599,7 @@ class App:
                         "({}) Looking for docker image '{}' in the Docker"
                         " registry".format(app, image)
                     )
-                    images = docker_client.images.search(image)
+                    images = Stack.get_docker_client().images.search(image)
                     for remote_image in images:
                         if remote_image["name"] == image:
                             return True
@@ -410,26 +674,20 @@ class App:
     @staticmethod
     def read_config():
 
-        # Get the path to the config.
-        apps_config = os.path.join(Stack.get_stack_root(), "docker-compose.yml")
-
-        # Parse the yaml.
-        if os.path.exists(apps_config):
-            with open(apps_config, "r") as f:
-                return yaml.load(f, Loader=yaml.FullLoader)
+        # Get the parsed docker-compose.yml
+        return Stack.load_config().compose
 
     @staticmethod
     def get_config(app, config):
-        try:
-            # Get the config.
-            config_dict = App.read_config()
 
-            return config_dict["services"][app][config]
-
-        except KeyError:
+        # Get the service.
+        service = Stack.load_config().get_service(app)
+        if service is None or service.get(config) is None:
             logger.debug("({}) No property '{}' found".format(app, config))
             return None
 
+        return service.get(config)
+
     @staticmethod
     def get_app_stack_config(app, config):
 
@@ -438,16 +696,14 @@ class App:
         if config is not None:
             return config
 
-        try:
-            # Get the config.
-            config_dict = App.read_config()
-
-            return config_dict["services"][app]["labels"][config]
-
-        except KeyError:
+        # Check the service's labels
+        service = Stack.load_config().get_service(app)
+        if service is None or service.labels.get(config) is None:
             logger.debug("({}) No property '{}' found".format(app, config))
             return None
 
+        return service.labels.get(config)
+
     @staticmethod
     def get_packages_stack_config(package=None):
 
@@ -461,11 +717,8 @@ class App:
     @staticmethod
     def get_apps():
 
-        # Get the config.
-        config = App.read_config()
-
         # Return the apps.
-        return config["services"].keys()
+        return Stack.load_config().apps
 
     # NEED #
     @staticmethod
@@ -491,21 +744,33 @@ class App:
         return App.get_config(app, "image")
 
     @staticmethod
-    def get_value_from_logs(docker_client, app, regex, lines="all"):
+    def get_value_from_logs(app, regex, lines="all", since=None, latest=False):
+        """
+        Streams the app's logs and returns the first group of the first line
+        matching the pattern, without holding the whole log in memory
+        :param app: The app
+        :param regex: The pattern, with a group for the value
+        :param lines: How many lines from the end of the logs to search
+        :param since: Only search logs since this datetime or timestamp
+        :param latest: Whether to return the value from the last matching line,
+         searching from the tail backwards, instead of the first
+        :return: The value, or None if not found
+        """
 
         try:
             # Get the scireg container.
-            container = docker_client.containers.get(App.get_container_name(app))
-
-            # Get the logs.
-            logs = container.logs(tail=lines)
+            container = Stack.get_docker_client().containers.get(
+                App.get_container_name(app)
+            )
 
-            # Find the links.
-            matches = re.search(regex, logs)
+            # Search the logs.
+            matches = logs.search(
+                container, regex, since=since, tail=lines, latest=latest
+            )
             if matches:
 
                 # Get the value.
-                link = matches.group(1)
+                link = matches.group(1).decode(errors="replace")
                 logger.debug("({}) Found log value: '{}'".format(app, link))
 
                 return link
@@ -521,11 +786,14 @@ class App:
             return None
 
     @staticmethod
-    def run_command(docker_client, app, cmd):
+    def run_command(app, cmd):
+        from docker import errors as docker_errors
 
         try:
             # Get the container.
-            container = docker_client.container.get(App.get_container_name(app))
+            container = Stack.get_docker_client().containers.get(
+                App.get_container_name(app)
+            )
 
             # Run the command
             return container.exec_run(cmd)
@@ -540,7 +808,94 @@ class App:
         return None
 
     @staticmethod
-    def get_status(docker_client, app):
+    def exec_command(app, cmd, prefix=None):
+        """
+        Runs the command in the app's container, logging its stdout via
+        logger.info and its stderr via logger.error as it is produced
+        :param app: The app
+        :param cmd: The command, as a list of arguments
+        :param prefix: A prefix to add to every logged line
+        :return: The exit code of the command, or None if it could not be run
+        :rtype: int
+        """
+        from docker import errors as docker_errors
+
+        api = Stack.get_docker_client().api
+        try:
+            exec_id = api.exec_create(App.get_container_name(app) or app, cmd)["Id"]
+            output = api.exec_start(exec_id, stream=True, demux=True)
+
+            # Split each stream into lines as the chunks arrive
+            streams = (
+                (logging.INFO, process.LineSplitter()),
+                (logging.ERROR, process.LineSplitter()),
+            )
+            for chunks in output:
+                for (level, splitter), chunk in zip(streams, chunks):
+                    if chunk:
+                        process.log_lines(level, splitter.feed(chunk), prefix)
+
+            for level, splitter in streams:
+                process.log_lines(level, splitter.flush(), prefix)
+
+            return api.exec_inspect(exec_id)["ExitCode"]
+
+        except docker_errors.NotFound:
+            logger.error(
+                "({}) Container could not be found for running command".format(app)
+            )
+        except docker_errors.APIError as e:
+            logger.error("({}) Error while running command: {}".format(app, e))
+
+        return None
+
+    @staticmethod
+    def exec_many(apps, cmd, concurrency=None):
+        """
+        Runs the command in the apps' containers concurrently, logging the
+        output of each with a colored prefix, and logs a table of the exit
+        codes
+        :param apps: The apps
+        :param cmd: The command, as a list of arguments
+        :param concurrency: How many commands may run at once, defaults to
+         all of them
+        :return: The results of the commands, in the order of the apps
+        :rtype: list of Result
+        """
+        apps = list(apps)
+        if not apps:
+            return []
+
+        colors = dict(zip(apps, itertools.cycle(process.PREFIX_COLORS)))
+
+        def run(app):
+            start = time.monotonic()
+            code = App.exec_command(app, cmd, process.get_prefix(app, colors[app]))
+
+            return process.Result(app, cmd, code, time.monotonic() - start)
+
+        with ThreadPoolExecutor(max_workers=concurrency or len(apps)) as executor:
+            results = list(executor.map(run, apps))
+
+        # Summarize
+        rows = []
+        for result in results:
+            rows.append(
+                [
+                    "({})".format(result.name),
+                    "{:.1f}s".format(result.duration),
+                    result.code if result.code is not None else "not run",
+                ]
+            )
+
+        for line in process.format_table(["App", "Time", "Exit code"], rows):
+            logger.info(line)
+
+        return results
+
+    @staticmethod
+    def get_status(app, snapshot=None):
+        from docker import errors as docker_errors
 
         # Get the container name.
         name = App.get_container_name(app)
@@ -553,14 +908,58 @@ class App:
             return "N/A"
 
         # Fetch it.
-        try:
-            container = docker_client.containers.get(name)
+        if snapshot is not None:
+            container = snapshot.get_container(name)
+            if container is not None:
+                return container.status
 
-            return container.status
+        else:
+            try:
+                container = Stack.get_docker_client().containers.get(name)
 
-        except docker_errors.NotFound:
-            logger.debug("({}) Container could not be found".format(app))
-            return "Not found"
+                return container.status
+
+            except docker_errors.NotFound:
+                pass
+
+        logger.debug("({}) Container could not be found".format(app))
+        return "Not found"
+
+    @staticmethod
+    def wait_ready(apps=None, timeout=readiness.DEFAULT_TIMEOUT):
+        """
+        Waits for the apps' containers to be healthy, or running if they have
+        no healthcheck, and logs how long each one took
+        :param apps: The apps to wait for, defaults to all of them
+        :param timeout: How many seconds to wait for
+        :return: Whether every app became ready in time
+        :rtype: bool
+        """
+        containers = {}
+        for app in apps or App.get_apps():
+            if App.get_container_name(app):
+                containers[app] = App.get_container_name(app)
+            else:
+                logger.debug("({}) No container name, not waiting".format(app))
+
+        logger.info("Waiting for {} to be ready...".format(", ".join(containers)))
+        results = readiness.wait(Stack.get_docker_client(), containers, timeout)
+
+        # Report
+        rows = []
+        for app, (state, elapsed) in results.items():
+            rows.append(
+                [
+                    "({})".format(app),
+                    state,
+                    "{:.1f}s".format(elapsed) if elapsed is not None else "timed out",
+                ]
+            )
+
+        for line in process.format_table(["App", "State", "Ready after"], rows):
+            logger.info(line)
+
+        return all(elapsed is not None for _, elapsed in results.values())
 
     @staticmethod
     def init(app):
@@ -589,42 +988,17 @@ class App:
         apps_dir = os.path.relpath(Stack.get_config("apps-directory"))
         subdir = os.path.join(apps_dir, app)
 
-        # Ensure it exists.
-        if os.path.exists(subdir):
-
-            # Remove the current subtree.
-            Stack.run(["git", "rm", "-rf", subdir])
-            Stack.run(["rm", "-rf", subdir])
-            Stack.run(
-                [
-                    "git",
-                    "commit",
-                    "-m",
-                    '"Stack op: Removing subtree {} for cloning branch {}"'.format(
-                        app, repo_branch
-                    ),
-                ]
-            )
-
-        # Build the command
-        command = [
-            "git",
-            "subtree",
-            "add",
-            "--prefix={}".format(subdir),
-            repo_url,
-            repo_branch,
-            "--squash",
-        ]
-
         # Check for pre-clone hook
         Stack.hook("pre-clone", app, [os.path.realpath(subdir)])
 
-        # Run the command.
-        return_code = Stack.run(command)
+        # Fetch the branch
+        fetched = subtree.fetch_many({app: (repo_url, repo_branch)})
+
+        # Switch the subtree, only changing the files that differ
+        initialized = fetched and subtree.switch(subdir, subtree.get_ref(app))
 
         # Check for post-clone hook
-        if return_code == 0:
+        if initialized:
             Stack.hook("post-clone", app, [os.path.realpath(subdir)])
 
             logger.debug("({}) App was initialized successfully!".format(app))
@@ -670,6 +1044,8 @@ class App:
             return
 
         # Connect.
+        import mysql.connector
+
         password = App.get_config(database, "environment").get("MYSQL_ROOT_PASSWORD")
         port = App.get_external_port("stackdb", "3306")
         db = mysql.connector.connect(
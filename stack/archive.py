@@ -0,0 +1,300 @@
+"""
+A local archive of container logs that outlives the containers. Each app's
+logs are appended to gzip segments under .stack/logs/<app>/, one gzip
+member per flush, and every member is listed in the segment's index with
+the time range of its lines and its byte range in the segment. Reading a
+time range only seeks to and decompresses the members that overlap it.
+"""
+import calendar
+import gzip
+import json
+import os
+import threading
+import time
+
+from stack.logs import get_sort_key, iter_lines
+from stack.snapshot import PROJECT_LABEL, SERVICE_LABEL, Snapshot
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# Where the archive is kept, relative to the stack
+ARCHIVE_DIR = os.path.join(".stack", "logs")
+
+# How large a segment may grow before a new one is started, in bytes
+SEGMENT_SIZE = 16 * 1024 * 1024
+
+# How many bytes of lines to compress together at most
+FLUSH_SIZE = 256 * 1024
+
+# How often to write buffered lines to the archive, in seconds
+FLUSH_INTERVAL = 5
+
+
+def format_key(timestamp):
+    """Returns the sort key of a line written at the Unix timestamp"""
+    seconds = int(timestamp)
+
+    return "{}.{:09d}".format(
+        time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)),
+        int((timestamp - seconds) * 1e9),
+    ).encode()
+
+
+def parse_key(key):
+    """Returns the Unix timestamp of a line's sort key"""
+    seconds, _, fraction = key.decode().partition(".")
+
+    return calendar.timegm(time.strptime(seconds, "%Y-%m-%dT%H:%M:%S")) + (
+        int(fraction or 0) / 1e9
+    )
+
+
+class LogArchive(object):
+    """The archived logs of one app, safe to append to from several threads"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.pending = []
+        self.pending_size = 0
+
+        # Resume after the last line archived
+        self.last = None
+        segments = self.get_segments()
+        if segments:
+            entries = self.read_index(segments[-1])
+            if entries:
+                self.last = entries[-1]["last"].encode()
+
+    @classmethod
+    def for_app(cls, root, app):
+        return cls(os.path.join(root, ARCHIVE_DIR, app))
+
+    def get_segments(self):
+        """Returns the paths of the segments, oldest first"""
+        try:
+            names = os.listdir(self.directory)
+
+        except OSError:
+            return []
+
+        return [
+            os.path.join(self.directory, name)
+            for name in sorted(names)
+            if name.endswith(".log.gz")
+        ]
+
+    @staticmethod
+    def read_index(segment):
+        """Returns the entries of the segment's index"""
+        try:
+            with open(segment + ".index", "r") as f:
+                return [json.loads(line) for line in f if line.strip()]
+
+        except (OSError, ValueError):
+            return []
+
+    def get_since(self):
+        """Returns the timestamp to resume following logs from, if any"""
+        return parse_key(self.last) if self.last is not None else None
+
+    def append(self, line):
+        """
+        Buffers a line of logs with its Docker timestamp, skipping lines
+        already archived, and flushes once enough are buffered
+        """
+        key = get_sort_key(line)
+        with self.lock:
+            if self.last is not None and key <= self.last:
+                return
+
+            self.pending.append((key, line))
+            self.pending_size += len(line) + 1
+            self.last = key
+
+            if self.pending_size >= FLUSH_SIZE:
+                self.write()
+
+    def flush(self):
+        with self.lock:
+            self.write()
+
+    def write(self):
+        """Compresses the buffered lines as a gzip member of the segment"""
+        if not self.pending:
+            return
+
+        lines, self.pending, self.pending_size = self.pending, [], 0
+        data = gzip.compress(b"".join(line + b"\n" for _, line in lines))
+
+        # Start a new segment, named by its first line, when this one is full
+        segments = self.get_segments()
+        if not segments or os.path.getsize(segments[-1]) >= SEGMENT_SIZE:
+            name = lines[0][0].decode().replace(":", "")
+            segments.append(os.path.join(self.directory, name + ".log.gz"))
+
+        os.makedirs(self.directory, exist_ok=True)
+        with open(segments[-1], "ab") as f:
+            offset = f.tell()
+            f.write(data)
+
+        # Index it once it is written
+        entry = {
+            "offset": offset,
+            "length": len(data),
+            "first": lines[0][0].decode(),
+            "last": lines[-1][0].decode(),
+            "lines": len(lines),
+        }
+        with open(segments[-1] + ".index", "a") as f:
+            f.write(json.dumps(entry, sort_keys=True) + "\n")
+
+    def read(self, since=None):
+        """
+        Yields the archived lines, oldest first, only decompressing the
+        members holding lines written since the timestamp
+        :param since: A Unix timestamp
+        """
+        since = format_key(since) if since is not None else None
+        for segment in self.get_segments():
+            entries = self.read_index(segment)
+            if since is not None and (
+                not entries or entries[-1]["last"].encode() < since
+            ):
+                continue
+
+            with open(segment, "rb") as f:
+                for entry in entries:
+                    if since is not None and entry["last"].encode() < since:
+                        continue
+
+                    f.seek(entry["offset"])
+                    data = gzip.decompress(f.read(entry["length"]))
+                    for line in data.split(b"\n")[:-1]:
+                        if since is None or get_sort_key(line) >= since:
+                            yield line
+
+
+class LogCollector(object):
+    """
+    Archives the logs of the project's containers as they are written,
+    including containers started after the collector
+    """
+
+    def __init__(self, docker_client, root, apps=None, project=None):
+        self.docker_client = docker_client
+        self.root = root
+        self.apps = apps
+        self.project = project or Snapshot.get_project_name()
+        self.lock = threading.Lock()
+        self.archives = {}
+        self.streams = {}
+        self.stopped = threading.Event()
+
+    def run(self):
+        """Collects logs until interrupted"""
+        label = "{}={}".format(PROJECT_LABEL, self.project)
+
+        # Subscribe before listing so no container is missed
+        events = self.docker_client.events(
+            since=int(time.time()),
+            decode=True,
+            filters={"type": "container", "label": label, "event": "start"},
+        )
+
+        flusher = threading.Thread(target=self.flush_periodically)
+        flusher.daemon = True
+        flusher.start()
+
+        try:
+            for container in self.docker_client.api.containers(
+                filters={"label": label}
+            ):
+                self.follow(container["Id"], container.get("Labels") or {})
+
+            for event in events:
+                attributes = (event.get("Actor") or {}).get("Attributes") or {}
+                self.follow(event.get("id"), attributes)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            events.close()
+            self.stop()
+
+    def follow(self, container_id, labels):
+        """Starts archiving the container's logs, unless already doing so"""
+        app = labels.get(SERVICE_LABEL)
+        if not app or (self.apps and app not in self.apps):
+            return
+
+        with self.lock:
+            if container_id in self.streams:
+                return
+
+            archive = self.get_archive(app)
+            stream = self.docker_client.api.logs(
+                container_id,
+                stream=True,
+                follow=True,
+                timestamps=True,
+                since=archive.get_since(),
+            )
+            self.streams[container_id] = stream
+
+        logger.info("({}) Archiving logs".format(app))
+        thread = threading.Thread(
+            target=self.read, args=(container_id, stream, archive)
+        )
+        thread.daemon = True
+        thread.start()
+
+    def get_archive(self, app):
+        """Returns the app's archive, to be called with the lock held"""
+        if app not in self.archives:
+            self.archives[app] = LogArchive.for_app(self.root, app)
+
+        return self.archives[app]
+
+    def read(self, container_id, stream, archive):
+        try:
+            for line in iter_lines(stream):
+                archive.append(line)
+
+        except Exception as e:
+            logger.debug("({}) Log stream ended: {}".format(container_id[:12], e))
+
+        finally:
+            # Follow it again if it is restarted
+            with self.lock:
+                self.streams.pop(container_id, None)
+            archive.flush()
+
+    def flush_periodically(self):
+        while not self.stopped.wait(FLUSH_INTERVAL):
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            archives = list(self.archives.values())
+
+        for archive in archives:
+            archive.flush()
+
+    def stop(self):
+        """Closes every stream and writes what is buffered"""
+        self.stopped.set()
+        with self.lock:
+            streams = list(self.streams.values())
+
+        for stream in streams:
+            try:
+                stream.close()
+
+            except Exception as e:
+                logger.debug("Could not close log stream: {}".format(e))
+
+        self.flush()
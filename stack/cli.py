@@ -4,20 +4,22 @@ stack
 Usage:
   stack init [<app>] [-v | --verbose]
   stack check [<app>] [-v | --verbose]
-  stack build [<app>] [--clean] [-v | --verbose]
+  stack build [<app>] [--clean] [--parallel] [--jobs=<jobs>] [-v | --verbose]
   stack test [-v | --verbose]
-  stack up [-d] [--clean] [--flags=<flags>] [-v | --verbose]
+  stack up [-d] [--clean] [--parallel] [--jobs=<jobs>] [--timeout=<seconds>] [--flags=<flags>] [-v | --verbose]
   stack down [--clean] [--flags=<flags>] [-v | --verbose]
-  stack reup [-c|--clean] [-p|--purge] [<app>] [-d] [--flags=<flags>] [-v | --verbose]
+  stack reup [-c|--clean] [-p|--purge] [<app>] [-d] [--timeout=<seconds>] [--flags=<flags>] [-v | --verbose]
+  stack wait [<apps>...] [--timeout=<seconds>] [-v | --verbose]
   stack shell [--sh] <app> [-v | --verbose]
-  stack logs <app> [--minutes=<minutes>] [--lines=<lines>] [-F|--follow]
+  stack exec [-a <app>]... [--jobs=<jobs>] [-v | --verbose] [--] <command>...
+  stack logs [<apps>...] [--minutes=<minutes>] [--lines=<lines>] [-F|--follow] [--grep=<regex> [--latest]] [--archive]
   stack clone <app> <branch> [-v | --verbose]
-  stack status [<app>] [-v | --verbose]
+  stack status [<app>] [-w | --watch] [-v | --verbose]
   stack checkout <app> [-b] <branch> [-v | --verbose]
-  stack update [<app>] [-v | --verbose]
+  stack update [<app>] [--jobs=<jobs>] [-v | --verbose]
   stack push <app> <branch> [--squash] [-v | --verbose]
   stack pull <app> <branch> [--squash] [-v | --verbose]
-  stack packages [<package>] [-v | --verbose]
+  stack packages [<package>] [--direct] [-f | --force] [--jobs=<jobs>] [-v | --verbose]
   stack secrets [-f | --force] [-v | --verbose]
   stack -h | --help
   stack --version
@@ -29,11 +31,20 @@ Options:
   -v,--verbose                      Show logging outputs during commands
   -c,--clean                        Re-fetch project files and re-build Docker images
   -p,--purge                        Clear any database related to the application
+  --parallel                        Build independent images concurrently
+  --jobs=<jobs>                     How many images or packages to build, or commands or fetches to run, at once
+  -a,--app=<app>                    An app to run the command in, defaults to all of them
   --flags=<flags>                   Additional flags to add to the docker-compose command (e.g. 'flag_a,flag_b')
   --sh                              Use the basic shell if Bash isn't available
   --minutes=<minutes>               How many minutes in the past to display logs from
-  --lines=<lines>                   How many lines from the tail of the logs to display
+  --lines=<lines>                   How many lines from the tail of each log to display
   -F,--follow                       Follow the logs in the current terminal
+  --grep=<regex>                    Only display lines of the logs matching the pattern
+  --latest                          Only display the most recent line matching --grep
+  --archive                         Keep archiving the logs of all containers under .stack/logs
+  --direct                          Copy the built wheel into the apps instead of uploading it
+  -w,--watch                        Keep updating the status as containers change
+  --timeout=<seconds>               How long to wait for services to be healthy [default: 300]
   -f,--force                        Force the command to run, possibly overwriting existing resources
 
 
@@ -46,7 +57,7 @@ Help:
 """  # noqa: E501
 
 
-from inspect import getmembers, isclass
+import sys
 
 from docopt import docopt
 import logging
@@ -54,6 +65,7 @@ from colorlog import ColoredFormatter
 
 from stack import VERSION
 from stack.app import Stack
+from stack.config import StackConfig
 
 
 def setup_logger(options):
@@ -89,26 +101,61 @@ def main():
     """Main CLI entrypoint."""
     import os
     from stack import commands
-    from stack.commands.base import Base
 
     options = docopt(__doc__, version=VERSION)
 
     # Setup logging.
     logger = setup_logger(options)
 
-    # Make sure we are in a valid location
-    if not Stack.check_stack(os.getcwd()):
-        logger.critical("The Stack is invalid, cannot run...")
+    # Find the command the user is trying to run.
+    try:
+        command = commands.find_command(options)
+        if command is None:
+            return
+
+    except ValueError as e:
+        logger.critical("{}, cannot run...".format(e))
         return
 
-    # Here we'll try to dynamically match the command the user is trying to run
-    # with a pre-defined command class we've already created.
-    for (k, v) in options.items():
-        if hasattr(commands, k) and v:
-            module = getattr(commands, k)
-            _commands = getmembers(
-                module, lambda cmd: isclass(cmd) and issubclass(cmd, Base)
-            )
-            command = [command[1] for command in _commands if command[0] != "Base"][0]
-            command = command(options)
-            command.run()
+    # Only initialize what the command needs
+    if command.config:
+
+        # Make sure we are in a valid location
+        if not Stack.check_stack(os.getcwd()):
+            logger.critical("The Stack is invalid, cannot run...")
+            return
+
+        # Load the configuration up front, from its snapshot if nothing changed
+        Stack.load_config()
+
+    if command.git and not Stack.check_git(os.getcwd()):
+        logger.critical("The Stack is not under version control, cannot run...")
+        return
+
+    docker_client = None
+    connection_errors = ()
+    if command.docker:
+        from docker.errors import DockerException
+        from requests.exceptions import ConnectionError
+
+        try:
+            docker_client = Stack.get_docker_client()
+
+        except (DockerException, ValueError) as e:
+            logger.critical("Could not connect to Docker, cannot run: {}".format(e))
+            return
+
+        # The client does not connect until it is first used
+        connection_errors = (ConnectionError,)
+
+    # Run it.
+    try:
+        command.cls(options, docker_client=docker_client).run()
+
+    except connection_errors as e:
+        logger.critical("Could not connect to Docker, cannot run: {}".format(e))
+        sys.exit(1)
+
+    logger.debug(
+        "Configuration files were parsed {} time(s)".format(StackConfig.parse_count)
+    )
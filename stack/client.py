@@ -0,0 +1,95 @@
+"""
+The Docker client shared by every command and helper in the process,
+created the first time it is needed.
+"""
+import os
+import threading
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# The Docker API version to use without asking the daemon first, supported
+# by Docker 20.10 and later; 'auto' negotiates it instead
+DEFAULT_API_VERSION = "1.41"
+
+# How many seconds to wait for a response from the daemon
+DEFAULT_TIMEOUT = 60
+
+# How many connections to keep open for each request URL. The SDK keeps a
+# pool per URL, so connections are only reused by requests for the same
+# resource, such as the threads of concurrent waits polling one container.
+DEFAULT_POOL_SIZE = 32
+
+_client = None
+_lock = threading.Lock()
+
+
+def get_settings(config=None):
+    """
+    Returns the client settings from the 'docker' section of stack.yml,
+    overridden by the DOCKER_API_VERSION, STACK_DOCKER_TIMEOUT and
+    STACK_DOCKER_POOL_SIZE environment variables
+    :param config: The 'docker' section of stack.yml, if any
+    :return: The version, timeout and pool size
+    :rtype: tuple
+    """
+    config = config or {}
+
+    version = os.environ.get("DOCKER_API_VERSION") or config.get(
+        "version", DEFAULT_API_VERSION
+    )
+    timeout = os.environ.get("STACK_DOCKER_TIMEOUT") or config.get(
+        "timeout", DEFAULT_TIMEOUT
+    )
+    pool_size = os.environ.get("STACK_DOCKER_POOL_SIZE") or config.get(
+        "pool-size", DEFAULT_POOL_SIZE
+    )
+
+    return str(version), int(timeout), int(pool_size)
+
+
+def get_docker_client(config=None):
+    """
+    Returns the process-wide Docker client, creating it on first use
+    :param config: The 'docker' section of stack.yml, only used the first time
+    :rtype: docker.DockerClient
+    """
+    global _client
+    if _client is None:
+        with _lock:
+            if _client is None:
+                _client = create_docker_client(config)
+
+    return _client
+
+
+def create_docker_client(config=None):
+    """
+    Creates a client for the daemon configured in the environment. With a
+    pinned API version, no request is made until the client is first used.
+    :param config: The 'docker' section of stack.yml, if any
+    :rtype: docker.DockerClient
+    """
+    import docker
+
+    version, timeout, pool_size = get_settings(config)
+    logger.debug(
+        "Docker client: API {}, timeout {}s, {} connections per URL".format(
+            version, timeout, pool_size
+        )
+    )
+
+    docker_client = docker.from_env(
+        version=version, timeout=timeout, max_pool_size=pool_size
+    )
+    return docker_client
+
+
+def reset():
+    """Closes and forgets the shared client, so the next use creates a new one"""
+    global _client
+    with _lock:
+        if _client is not None:
+            _client.close()
+        _client = None
@@ -1,18 +1,83 @@
-from stack.commands.base import Base
-from stack.commands.test import Test
-from stack.commands.check import Check
-from stack.commands.up import Up
-from stack.commands.shell import Shell
-from stack.commands.reup import Reup
-from stack.commands.down import Down
-from stack.commands.logs import Logs
-from stack.commands.clone import Clone
-from stack.commands.checkout import Checkout
-from stack.commands.pull import Pull
-from stack.commands.push import Push
-from stack.commands.status import Status
-from stack.commands.init import Init
-from stack.commands.build import Build
-from stack.commands.update import Update
-from stack.commands.packages import Packages
-from stack.commands.secrets import Secrets
+"""
+Commands register themselves with the @register decorator. Command modules
+are only imported when they are run, so the dependencies of one command
+(boto3, docker, etc) do not slow down every other command.
+"""
+from collections import namedtuple
+from importlib import import_module
+
+# Maps the docopt command key to the module implementing it
+MODULES = {
+    "test": "stack.commands.test",
+    "check": "stack.commands.check",
+    "up": "stack.commands.up",
+    "shell": "stack.commands.shell",
+    "reup": "stack.commands.reup",
+    "down": "stack.commands.down",
+    "logs": "stack.commands.logs",
+    "clone": "stack.commands.clone",
+    "checkout": "stack.commands.checkout",
+    "pull": "stack.commands.pull",
+    "push": "stack.commands.push",
+    "status": "stack.commands.status",
+    "init": "stack.commands.init",
+    "build": "stack.commands.build",
+    "update": "stack.commands.update",
+    "packages": "stack.commands.packages",
+    "secrets": "stack.commands.secrets",
+    "wait": "stack.commands.wait",
+    "exec": "stack.commands.exec",
+}
+
+# A registered command and what it needs initialized before it runs
+Command = namedtuple("Command", ["name", "cls", "config", "docker", "git"])
+
+# The dispatch table, keyed by docopt command key
+registry = {}
+
+
+def register(name, config=True, docker=False, git=False):
+    """
+    Class decorator that adds a command to the dispatch table
+    :param name: The docopt command key, e.g. 'up'
+    :param config: Whether the command needs a valid stack.yml and
+     docker-compose.yml
+    :param docker: Whether the command needs a Docker client
+    :param git: Whether the command needs to run in a git working copy
+    """
+
+    def decorator(cls):
+        registry[name] = Command(name, cls, config, docker, git)
+        return cls
+
+    return decorator
+
+
+def get_command(name):
+    """
+    Returns the registered command for the given docopt command key,
+    importing its module if needed
+    :param name: The command key, e.g. 'up'
+    :type name: str
+    :rtype: Command
+    """
+    if name not in registry:
+        import_module(MODULES[name])
+
+    return registry[name]
+
+
+def find_command(options):
+    """
+    Returns the registered command selected by the parsed docopt options
+    :param options: The options returned by docopt
+    :type options: dict
+    :return: The command or None if no command was selected
+    :rtype: Command
+    :raises ValueError: If more than one command was selected
+    """
+    names = [name for name in MODULES if options.get(name) is True]
+    if len(names) > 1:
+        raise ValueError("Multiple commands matched: {}".format(", ".join(names)))
+
+    return get_command(names[0]) if names else None
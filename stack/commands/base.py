@@ -1,17 +1,49 @@
 """The base command."""
 
+import sys
+
+from stack.readiness import DEFAULT_TIMEOUT
+
+import logging
+
+logger = logging.getLogger("stack")
+
 
 class Base(object):
     """A base command."""
 
     def __init__(self, options, *args, **kwargs):
         self.options = options
+        self.docker_client = kwargs.pop("docker_client", None)
         self.args = args
         self.kwargs = kwargs
 
     def run(self):
         raise NotImplementedError("You must implement the run() method yourself!")
 
+    def get_jobs(self):
+        """Returns the number of concurrent jobs requested with --jobs, if any"""
+        jobs = self.options.get("--jobs")
+        if not jobs:
+            return None
+
+        try:
+            return max(1, int(jobs))
+
+        except ValueError:
+            logger.error("--jobs must be a number, not '{}'".format(jobs))
+            sys.exit(1)
+
+    def get_timeout(self):
+        """Returns the number of seconds requested with --timeout"""
+        timeout = self.options.get("--timeout") or DEFAULT_TIMEOUT
+        try:
+            return float(timeout)
+
+        except ValueError:
+            logger.error("--timeout must be a number, not '{}'".format(timeout))
+            sys.exit(1)
+
     @staticmethod
     def yes_no(answer, default="yes"):
         yes = {"yes", "y", "ye", "", "ok", "k", "1"}
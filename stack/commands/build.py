@@ -1,7 +1,6 @@
 """The build command."""
 
-import docker
-
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 
@@ -10,12 +9,10 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("build", docker=True)
 class Build(Base):
     def run(self):
 
-        # Get the docker client.
-        docker_client = docker.from_env()
-
         # Determine the app.
         app = self.options["<app>"]
         clean = self.options["--clean"]
@@ -25,10 +22,19 @@ class Build(Base):
 
             # Check if we should clean it.
             if clean:
-                App.clean_images(docker_client, app)
+                App.clean_images(app)
 
             App.build(app)
 
+        elif self.options["--parallel"]:
+
+            # Clean first, then build everything concurrently
+            if clean:
+                for app in App.get_built_apps():
+                    App.clean_images(app)
+
+            App.build_many(App.get_built_apps(), self.get_jobs())
+
         else:
 
             # Iterate through built apps
@@ -36,6 +42,6 @@ class Build(Base):
 
                 # Check if we should clean it.
                 if clean:
-                    App.clean_images(docker_client, app)
+                    App.clean_images(app)
 
                 App.build(app)
@@ -1,7 +1,6 @@
 """The check command."""
 
-import docker
-
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 
@@ -10,18 +9,16 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("check", docker=True)
 class Check(Base):
     def run(self):
 
-        # Get the docker client.
-        docker_client = docker.from_env()
-
         # Determine the app.
         app = self.options["<app>"]
         if app is not None:
 
             # Check it.
-            if App.check(docker_client, app):
+            if App.check(app):
                 logger.info("({}) Is valid and ready to go!".format(app))
 
         else:
@@ -32,7 +29,7 @@ class Check(Base):
             for app in apps:
 
                 # Check the app.
-                if App.check(docker_client, app):
+                if App.check(app):
                     logger.info("({}) Is valid and ready to go!".format(app))
 
                 else:
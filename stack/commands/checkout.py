@@ -1,16 +1,20 @@
 """The checkout command."""
 
 import os
+import sys
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
+from stack import subtree
 
 import logging
 
 logger = logging.getLogger("stack")
 
 
+@register("checkout", git=True)
 class Checkout(Base):
     def run(self):
 
@@ -33,7 +37,7 @@ class Checkout(Base):
             logger.error(
                 "Current working copy has changes, cannot update app repositories"
             )
-            exit(1)
+            sys.exit(1)
 
         # Check if new branch.
         if self.options["-b"]:
@@ -66,33 +70,13 @@ class Checkout(Base):
             # Check for pre-checkout hook
             Stack.hook("pre-checkout", app, [os.path.realpath(subdir)])
 
-            # Build the command
-            command = [
-                "git",
-                "subtree",
-                "add",
-                "--prefix={}".format(subdir),
-                repo_url,
-                branch,
-                "--squash",
-            ]
-
-            # Remove the current subtree.
-            Stack.run(["git", "rm", "-rf", subdir])
-            Stack.run(["rm", "-rf", subdir])
-            Stack.run(
-                [
-                    "git",
-                    "commit",
-                    "-m",
-                    '"Stack op: Removing subtree {} for cloning branch {}"'.format(
-                        app, branch
-                    ),
-                ]
-            )
+            # Fetch the branch
+            if not subtree.fetch_many({app: (repo_url, branch)}):
+                return
 
-            # Run the command.
-            Stack.run(command)
+            # Switch the subtree, only changing the files that differ
+            if not subtree.switch(subdir, subtree.get_ref(app)):
+                return
 
         # Check for post-checkout hook
         Stack.hook("post-checkout", app, [os.path.realpath(subdir)])
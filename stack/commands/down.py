@@ -1,5 +1,6 @@
 """The down command."""
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import Stack
 
@@ -8,6 +9,7 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("down")
 class Down(Base):
     def run(self):
 
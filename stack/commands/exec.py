@@ -0,0 +1,26 @@
+"""The exec command."""
+
+import sys
+
+from stack.commands import register
+from stack.commands.base import Base
+from stack.app import App
+
+import logging
+
+logger = logging.getLogger("stack")
+
+
+@register("exec", docker=True)
+class Exec(Base):
+    def run(self):
+
+        # Determine the apps, defaulting to those with a container.
+        apps = self.options["--app"] or [
+            app for app in App.get_apps() if App.get_container_name(app)
+        ]
+
+        # Run it everywhere at once.
+        results = App.exec_many(apps, self.options["<command>"], self.get_jobs())
+        if any(result.code != 0 for result in results):
+            sys.exit(1)
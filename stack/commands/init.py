@@ -1,5 +1,6 @@
 """The init command."""
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 
@@ -8,6 +9,7 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("init", git=True)
 class Init(Base):
     def run(self):
 
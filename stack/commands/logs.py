@@ -1,20 +1,80 @@
 """The logs command."""
 
+import itertools
+import re
+import sys
+import time
+
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App, Stack
+from stack.process import PREFIX_COLORS, get_prefix
 
 import logging
 
 logger = logging.getLogger("stack")
 
 
+# The options that read the logs through the Docker SDK
+SDK_OPTIONS = ("--archive", "--grep", "--follow", "--minutes")
+
+
+@register("logs")
 class Logs(Base):
     def run(self):
 
-        # Check for time constraints.
-        if self.options["--minutes"]:
+        # Get the apps, if any.
+        apps = self.options["<apps>"]
+
+        # Only plain logs are read through docker-compose.
+        if not any(self.options[option] for option in SDK_OPTIONS):
+            return self.compose_logs(apps)
+
+        from docker.errors import DockerException
+        from requests.exceptions import ConnectionError
+
+        try:
+            Stack.get_docker_client()
+
+        except (DockerException, ValueError) as e:
+            logger.critical("Could not connect to Docker, cannot run: {}".format(e))
+            sys.exit(1)
+
+        # The client does not connect until it is first used
+        try:
+            self.read_logs(apps)
+
+        except ConnectionError as e:
+            logger.critical("Could not connect to Docker, cannot run: {}".format(e))
+            sys.exit(1)
+
+    def read_logs(self, apps):
+        """Reads the apps' logs, or all of them, through the Docker SDK"""
+
+        # Check for archiving.
+        if self.options["--archive"]:
+            return self.archive(apps)
+
+        # Check for searching.
+        if self.options["--grep"]:
+            if len(apps) != 1:
+                logger.error("--grep searches the logs of a single app")
+                sys.exit(1)
+
+            return self.grep(apps[0])
+
+        # Check for following.
+        if self.options["--follow"]:
+            return self.follow(apps or App.get_apps())
+
+        # Build the command for each app.
+        for app in apps or App.get_apps():
+
+            # Fall back to the archive once the container is gone.
+            if not self.exists(app):
+                self.read_archive(app)
+                continue
 
-            # Build the command.
             command = [
                 "docker",
                 "logs",
@@ -23,32 +83,188 @@ class Logs(Base):
                 "{}m".format(self.options["--minutes"]),
             ]
 
-            # Check for follow
-            if self.options["--follow"]:
-                command.append("-f")
-
             # Add the app.
-            container = App.get_container_name(self.options["<app>"])
-            command.append(container)
+            command.append(App.get_container_name(app) or app)
 
             # Capture and redirect output.
-            Stack.run(command)
+            Stack.run(command, passthrough=True)
 
-        else:
+    def compose_logs(self, apps):
+        """Prints the apps' logs, or all of them, with docker-compose"""
 
-            # Build the command.
-            command = ["docker-compose", "logs", "-t"]
+        # Build the command.
+        command = ["docker-compose", "logs", "-t"]
 
-            # Check for lines.
-            if self.options["--lines"]:
-                command.extend(["--tail", self.options["--lines"]])
+        # Check for lines.
+        if self.options["--lines"]:
+            command.extend(["--tail", str(self.get_tail())])
 
-            # Check for follow
-            if self.options["--follow"]:
-                command.append("-f")
+        # Add the apps.
+        command.extend(apps)
 
-            # Add the app.
-            command.append(self.options["<app>"])
+        # Capture and redirect output.
+        Stack.run(command, passthrough=True)
 
-            # Capture and redirect output.
-            Stack.run(command)
+    def exists(self, app):
+        """Returns whether the app's container exists"""
+        from docker import errors as docker_errors
+
+        try:
+            Stack.get_docker_client().api.inspect_container(
+                App.get_container_name(app) or app
+            )
+            return True
+
+        except docker_errors.NotFound:
+            return False
+
+    def archive(self, apps):
+        """Archives the logs of the apps' containers, or all of them"""
+        from stack.archive import ARCHIVE_DIR, LogCollector
+
+        logger.info("Archiving logs to {}, press Ctrl+C to stop...".format(ARCHIVE_DIR))
+        LogCollector(
+            Stack.get_docker_client(), Stack.get_stack_root(), apps or None
+        ).run()
+
+    def read_archive(self, app):
+        """Prints the app's archived logs since --minutes ago"""
+        from stack.archive import LogArchive
+
+        archive = LogArchive.for_app(Stack.get_stack_root(), app)
+        if not archive.get_segments():
+            logger.error("({}) Container could not be found".format(app))
+            return
+
+        logger.info("({}) Container could not be found, reading archive".format(app))
+        for line in archive.read(self.get_since()):
+            sys.stdout.write(line.decode(errors="replace") + "\n")
+        sys.stdout.flush()
+
+    def get_since(self):
+        """Returns the timestamp requested with --minutes, if any"""
+        if not self.options["--minutes"]:
+            return None
+
+        try:
+            return int(time.time() - float(self.options["--minutes"]) * 60)
+
+        except ValueError:
+            logger.error(
+                "--minutes must be a number, not '{}'".format(self.options["--minutes"])
+            )
+            sys.exit(1)
+
+    def get_tail(self):
+        """Returns the number of lines requested with --lines, or 'all'"""
+        lines = self.options["--lines"]
+        if not lines:
+            return "all"
+
+        try:
+            tail = int(lines)
+
+        except ValueError:
+            tail = -1
+
+        if tail < 0:
+            logger.error("--lines must be a number of lines, not '{}'".format(lines))
+            sys.exit(1)
+
+        return tail
+
+    def follow(self, apps):
+        """
+        Follows the logs of the apps over concurrent connections, merged in
+        the order they were written and prefixed by app
+        """
+        from docker import errors as docker_errors
+        from stack import logs
+
+        # Find the containers.
+        containers = {}
+        for app in apps:
+            try:
+                containers[app] = Stack.get_docker_client().containers.get(
+                    App.get_container_name(app) or app
+                )
+
+            except docker_errors.NotFound:
+                logger.warning("({}) Container could not be found".format(app))
+
+        if not containers:
+            logger.error("No containers to follow the logs of")
+            sys.exit(1)
+
+        colors = itertools.cycle(PREFIX_COLORS)
+        prefixes = {app: get_prefix(app, next(colors)) for app in containers}
+
+        merger = logs.LogMerger()
+        merger.start(containers, self.get_since(), self.get_tail())
+        try:
+            for batch in merger.batches():
+                sys.stdout.write(
+                    "".join(
+                        "{}{}\n".format(prefixes[app], line.decode(errors="replace"))
+                        for app, line in batch
+                    )
+                )
+                sys.stdout.flush()
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            merger.close()
+
+    def grep(self, app):
+        """
+        Prints the lines of the app's logs matching the pattern, streaming
+        them from Docker rather than loading them all at once
+        """
+        from docker import errors as docker_errors
+        from stack import logs
+
+        pattern = self.options["--grep"]
+        try:
+            re.compile(pattern)
+
+        except re.error as e:
+            logger.error("--grep must be a regular expression: {}".format(e))
+            sys.exit(1)
+
+        # Check for constraints.
+        since = self.get_since()
+        tail = self.get_tail()
+
+        try:
+            container = Stack.get_docker_client().containers.get(
+                App.get_container_name(app) or app
+            )
+
+        except docker_errors.NotFound:
+            logger.error("({}) Container could not be found".format(app))
+            sys.exit(1)
+
+        # Find the most recent match, or every match as it is read.
+        if self.options["--latest"]:
+            match = logs.search(container, pattern, since, tail, latest=True)
+            matches = [match] if match is not None else []
+
+        else:
+            matches = logs.scan(
+                container, pattern, since, tail, follow=self.options["--follow"]
+            )
+
+        found = False
+        try:
+            for match in matches:
+                found = True
+                sys.stdout.write(match.string.decode(errors="replace") + "\n")
+                sys.stdout.flush()
+
+        except KeyboardInterrupt:
+            pass
+
+        if not found:
+            sys.exit(1)
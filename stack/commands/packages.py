@@ -1,25 +1,51 @@
 """The packages command."""
 
-import docker
+import glob
+import itertools
 import os
+import shlex
+import sys
+import tarfile
+import time
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
+from stack import process
+from stack.fingerprint import DockerIgnore, Manifest, fingerprint_tree
+from stack.snapshot import Snapshot
+from stack.upload import CHUNK_SIZE, Uploader, parse_filename
 
 import logging
 
 logger = logging.getLogger("stack")
 
+# Where wheels are copied to in the containers
+WHEEL_DIR = "/tmp"
 
+# What building a package writes, left out of its fingerprint
+BUILD_OUTPUTS = [
+    ".git",
+    ".tox",
+    "build",
+    "dist",
+    "**/*.egg-info",
+    "**/__pycache__",
+    "**/*.pyc",
+]
+
+
+@register("packages", docker=True)
 class Packages(Base):
     def run(self):
 
-        # Ensure we have an index specified
+        # Ensure we have an index specified, unless copying wheels directly
+        direct = self.options.get("--direct")
         index = Stack.get_config("index")
-        if not index:
+        if not index and not direct:
             logger.error("Stack package index not specified, cannot proceed")
-            exit(1)
+            sys.exit(1)
 
         # Get the package, if specified
         if self.options["<package>"]:
@@ -27,131 +53,362 @@ class Packages(Base):
         else:
             packages = [package["name"] for package in Stack.get_config("packages")]
 
-        # Process each package
-        for package in packages:
+        # Build them all, then update the services using the new ones
+        jobs = self.get_jobs()
+        uploader = None if direct else self.get_uploader(jobs or os.cpu_count())
+        try:
+            outcomes = self.update_many(
+                packages, direct, self.options.get("--force"), jobs, uploader
+            )
 
-            # Update the package
-            if self.update(package):
-                logger.info("Package '{}' was updated successfully".format(package))
+        finally:
+            if uploader is not None:
+                uploader.close()
 
-                # Update services
-                self.update_apps(package)
+        failed = False
+        for package in packages:
+            result = outcomes.get(package, {}).get("result")
+            if result in ("uploaded", "built"):
+                if not self.update_apps(package, outcomes[package].get("wheel")):
+                    logger.error(
+                        "Package '{}' could not be updated in every app".format(package)
+                    )
 
-            else:
-                logger.error("Error: Could not update package")
-                exit(1)
+            elif result != "unchanged":
+                failed = True
+
+        if failed:
+            logger.error("Error: Could not update every package")
+            sys.exit(1)
 
     @staticmethod
-    def update(package):
+    def update_many(
+        packages, direct=False, force=False, concurrency=None, uploader=None
+    ):
+        """
+        Updates the packages concurrently. A package is only built once the
+        packages it lists in 'depends_on' have been.
+        :param packages: The packages
+        :param direct: Whether to only build wheels, rather than upload them
+        :param force: Whether to update packages whose sources did not change
+        :param concurrency: How many packages may be built at once
+        :param uploader: The Uploader to upload them with
+        :return: Maps each package that was attempted to its outcome
+        :rtype: dict
+        """
+        packages = list(packages)
+        dependencies = {
+            package: (App.get_packages_stack_config(package) or {}).get("depends_on")
+            or []
+            for package in packages
+        }
+        colors = dict(zip(packages, itertools.cycle(process.PREFIX_COLORS)))
+        outcomes = {}
+
+        def update(package):
+            prefix = process.get_prefix(package, colors[package])
+            outcomes[package] = Packages.update(
+                package, direct, force, prefix, uploader
+            )
+            return outcomes[package]["result"] != "failed"
+
+        results = process.run_graph(packages, dependencies, update, concurrency)
+
+        # Summarize
+        def format_duration(duration):
+            return "{:.1f}s".format(duration) if duration is not None else "-"
+
+        rows = []
+        for package in packages:
+            outcome = outcomes.get(package, {})
+            rows.append(
+                [
+                    "({})".format(package),
+                    format_duration(outcome.get("build")),
+                    format_duration(outcome.get("upload")),
+                    (
+                        outcome["result"]
+                        if results[package].code is not None
+                        else "skipped"
+                    ),
+                ]
+            )
+
+        for line in process.format_table(
+            ["Package", "Build", "Upload", "Result"], rows
+        ):
+            logger.info(line)
+
+        return outcomes
 
+    @staticmethod
+    def update(package, direct=False, force=False, prefix=None, uploader=None):
+        """
+        Builds the package and uploads it to the index, unless its sources
+        did not change since it was last uploaded
+        :param package: The package
+        :param direct: Whether to only build a wheel, rather than upload it
+        :param force: Whether to update it even if its sources did not change
+        :param prefix: A prefix to add to every logged line
+        :param uploader: The Uploader to upload it with
+        :return: The result, how long building and uploading took, and the
+         wheel when only building one
+        :rtype: dict
+        """
+        outcome = {"result": "failed"}
         try:
-            # Get devpi index details
-            port = App.get_external_port("devpi", "3141")
-            index_url = "http://localhost:{}/root/public/".format(port)
-
             # Get the description
             config = App.get_packages_stack_config(package)
-
-            # Get password
-            password = App.get_config("devpi", "environment").get("DEVPI_PASSWORD")
-
-            # Get the location
-            path = os.path.abspath(config["path"])
-            dists = os.path.join(path, "dist", "*")
+            if not config:
+                logger.error("({}) Package is not configured".format(package))
+                return outcome
+
+            # Skip it if its sources did not change since it was uploaded
+            manifest = Manifest.load(
+                os.path.join(Stack.get_stack_root(), ".stack", "packages.json")
+            )
+            record = manifest.get(package) or {}
+            fingerprint, files = Packages.fingerprint(config, record.get("files"))
+            if not direct and not force and record.get("fingerprint") == fingerprint:
+                logger.info("({}) Sources unchanged, skipping".format(package))
+                outcome["result"] = "unchanged"
+                return outcome
 
             # Build the package
-            Stack.run(config.get("build"), cwd=path)
-
-            # Upload
-            cmd = [
-                "twine",
-                "upload",
-                dists,
-                "--repository-url",
-                index_url,
-                "--skip-existing",
-                "-u",
-                "root",
-                "-p",
-                password,
-            ]
-
-            # Run it and make sure it was successful
-            return Stack.run(cmd) == 0
+            dists = Packages.get_dists(config)
+            start = time.monotonic()
+            if Packages.build(config, prefix) != 0:
+                return outcome
+            outcome["build"] = time.monotonic() - start
+
+            if direct:
+                outcome["wheel"] = Packages.get_wheel(config, dists, prefix)
+                outcome["result"] = "built" if outcome["wheel"] else "failed"
+                return outcome
+
+            # Upload it
+            start = time.monotonic()
+            if not Packages.upload(config, uploader, prefix):
+                return outcome
+            outcome["upload"] = time.monotonic() - start
+
+            # Record what was uploaded
+            manifest.set(package, {"fingerprint": fingerprint, "files": files})
+            outcome["result"] = "uploaded"
 
         except Exception as e:
             logger.exception("Error updating package: {}".format(e), exc_info=True)
-            return False
+
+        return outcome
 
     @staticmethod
-    def update_apps(package):
+    def get_uploader(jobs=None):
+        """
+        Returns an Uploader for the stack's devpi index
+        :param jobs: How many packages may be uploaded at once
+        :rtype: Uploader
+        """
 
-        # Find all services listing this package
-        for app, config in Stack.get_config("apps").items():
+        # Get devpi index details
+        port = App.get_external_port("devpi", "3141")
+        index_url = "http://localhost:{}/root/public/".format(port)
+
+        # Get password
+        password = App.get_config("devpi", "environment").get("DEVPI_PASSWORD")
+
+        return Uploader(index_url, "root", password, jobs=jobs)
+
+    @staticmethod
+    def upload(config, uploader, prefix=None):
+        """
+        Uploads the package's distributions the index does not have yet
+        :param config: The package's config
+        :param uploader: The Uploader to upload them with
+        :param prefix: A prefix to add to every logged line
+        :return: Whether it succeeded
+        :rtype: bool
+        """
+        dists = glob.glob(os.path.join(os.path.abspath(config["path"]), "dist", "*"))
+
+        return uploader.upload(sorted(dists), prefix)
+
+    @staticmethod
+    def fingerprint(config, previous=None):
+        """
+        Fingerprints the package's sources, leaving out what building it
+        writes
+        :param config: The package's config
+        :param previous: The files dict returned by a previous call
+        :return: The fingerprint and a dict of the files it covers
+        :rtype: tuple
+        """
+        return fingerprint_tree(
+            os.path.abspath(config["path"]),
+            DockerIgnore(BUILD_OUTPUTS),
+            previous,
+            {"build": config.get("build")},
+        )
+
+    @staticmethod
+    def build(config, prefix=None):
+        """
+        Runs the package's build command in its directory
+        :param config: The package's config
+        :param prefix: A prefix to add to every logged line
+        :return: The exit code of the build
+        :rtype: int
+        """
+        build = config.get("build")
+        if isinstance(build, str):
+            build = shlex.split(build)
+
+        return Stack.run(build, cwd=os.path.abspath(config["path"]), prefix=prefix)
 
+    @staticmethod
+    def get_dists(config):
+        """
+        Returns the package's built distributions
+        :param config: The package's config
+        :return: Maps the path of each distribution to its modification time
+         and size
+        :rtype: dict
+        """
+        dists = {}
+        for path in glob.glob(
+            os.path.join(os.path.abspath(config["path"]), "dist", "*")
+        ):
+            stat = os.stat(path)
+            dists[path] = (stat.st_mtime_ns, stat.st_size)
+
+        return dists
+
+    @staticmethod
+    def get_wheel(config, previous, prefix=None):
+        """
+        Returns the wheel of the version the build wrote, rather than any
+        other version left in the package's dist directory
+        :param config: The package's config
+        :param previous: The distributions from get_dists before the build
+        :param prefix: A prefix to add to every logged line
+        :return: The path of the wheel, if the build wrote one
+        :rtype: str
+        """
+        prefix = prefix or ""
+        wheels = {}
+        for path, stat in Packages.get_dists(config).items():
+            metadata = parse_filename(os.path.basename(path))
+            if metadata and metadata[2] == "bdist_wheel" and previous.get(path) != stat:
+                wheels.setdefault(metadata[1], []).append(path)
+
+        if not wheels:
+            logger.error("{}The build did not write a wheel".format(prefix))
+            return None
+
+        if len(wheels) > 1:
+            logger.error(
+                "{}The build wrote wheels of several versions: {}".format(
+                    prefix, ", ".join(sorted(wheels))
+                )
+            )
+            return None
+
+        return sorted(wheels.popitem()[1])[0]
+
+    @staticmethod
+    def make_archive(path):
+        """
+        Yields a tar archive holding the file, reading the file as it goes
+        rather than building the archive in memory
+        :param path: The path of the file
+        :rtype: generator
+        """
+        stat = os.stat(path)
+        info = tarfile.TarInfo(os.path.basename(path))
+        info.size = stat.st_size
+        info.mtime = int(stat.st_mtime)
+        info.mode = 0o644
+        yield info.tobuf()
+
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                yield chunk
+
+        # Pad the file to a whole block, then end the archive
+        yield tarfile.NUL * (-info.size % tarfile.BLOCKSIZE)
+        yield tarfile.NUL * tarfile.BLOCKSIZE * 2
+
+    @staticmethod
+    def copy_wheel(apps, wheel):
+        """
+        Copies the wheel into the apps' containers
+        :param apps: The apps
+        :param wheel: The path of the wheel
+        :return: The apps it was copied to
+        :rtype: list
+        """
+        from docker import errors as docker_errors
+
+        api = Stack.get_docker_client().api
+        copied = []
+        for app in apps:
             try:
-                # Check packages
-                if config.get("packages") and package in config.get("packages"):
-
-                    # Get the docker client.
-                    docker_client = docker.from_env()
-
-                    # Determine the app.
-                    if App.check_running(docker_client, app):
-                        logger.info(
-                            "App '{}' depends on '{}', reinstalling...".format(
-                                app, package
-                            )
-                        )
-
-                        # Build the uninstall command
-                        uninstall = [
-                            "docker-compose",
-                            "exec",
-                            app,
-                            "pip",
-                            "uninstall",
-                            "-y",
-                            package,
-                        ]
-
-                        # Execute a shell.
-                        code = Stack.run(uninstall)
-                        if code == 0:
-                            logger.info("    ... uninstalled ...")
-
-                            # Build the install command
-                            install = [
-                                "docker-compose",
-                                "exec",
-                                app,
-                                "pip",
-                                "install",
-                                package,
-                            ]
-
-                            # Execute a shell.
-                            code = Stack.run(install)
-                            if code == 0:
-                                logger.info("        ... reinstall succeeded!")
-
-                            else:
-                                logger.error(
-                                    "    .... failed with exit code: {}".format(code)
-                                )
-
-                        else:
-                            logger.error(
-                                "    .... failed with exit code: {}".format(code)
-                            )
-
-                    else:
-                        logger.error(
-                            "    .... App {} is not running, cannot update".format(app)
-                        )
-
-            except Exception as e:
-                logger.exception(
-                    "Error reinstalling package for {}: {}".format(app, e),
-                    exc_info=True,
+                container = App.get_container_name(app) or app
+                if api.put_archive(container, WHEEL_DIR, Packages.make_archive(wheel)):
+                    copied.append(app)
+                    continue
+
+            except docker_errors.APIError as e:
+                logger.debug("({}) Error copying wheel: {}".format(app, e))
+
+            logger.error("    .... Could not copy the wheel into {}".format(app))
+
+        return copied
+
+    @staticmethod
+    def update_apps(package, wheel=None):
+        """
+        Reinstalls the package in the running apps that depend on it, with a
+        single pip exec in each app's container, all of them at once
+        :param package: The package
+        :param wheel: A wheel of the package to copy into the containers and
+         install, rather than installing from the index
+        :return: Whether every app was updated
+        :rtype: bool
+        """
+
+        # Find all services listing this package
+        apps = [
+            app
+            for app, config in Stack.get_config("apps").items()
+            if package in (config.get("packages") or [])
+        ]
+        if not apps:
+            return True
+
+        # Check them all at once.
+        snapshot = Snapshot.take(Stack.get_docker_client())
+        running = []
+        for app in apps:
+            if App.check_running(app, snapshot=snapshot):
+                logger.info(
+                    "App '{}' depends on '{}', reinstalling...".format(app, package)
                 )
+                running.append(app)
+
+            else:
+                logger.error(
+                    "    .... App {} is not running, cannot update".format(app)
+                )
+
+        # Copy the wheel in to install it from there.
+        requirement = package
+        if wheel:
+            running = Packages.copy_wheel(running, wheel)
+            requirement = "{}/{}".format(WHEEL_DIR, os.path.basename(wheel))
+
+        # Reinstall it without touching its dependencies.
+        results = App.exec_many(
+            running, ["pip", "install", "--force-reinstall", "--no-deps", requirement]
+        )
+
+        return len(running) == len(apps) and all(result.code == 0 for result in results)
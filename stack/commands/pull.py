@@ -2,6 +2,7 @@
 
 import os
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
@@ -11,6 +12,7 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("pull", git=True)
 class Pull(Base):
     def run(self):
 
@@ -1,7 +1,8 @@
 """The reup command."""
 
-import docker
+import sys
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
@@ -11,12 +12,10 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("reup", docker=True)
 class Reup(Base):
     def run(self):
 
-        # Get a docker client.
-        docker_client = docker.from_env()
-
         # Get options.
         clean = self.options["--clean"]
         app = self.options["<app>"]
@@ -28,7 +27,7 @@ class Reup(Base):
             if clean:
 
                 # Clean and fetch.
-                App.clean_images(docker_client, app)
+                App.clean_images(app)
 
                 # Build it.
                 App.build(app)
@@ -77,6 +76,11 @@ class Reup(Base):
             Stack.run(up)
             Stack.run(["docker-compose", "start", app])
 
+            # Wait for it to be healthy before running the post-up hook
+            if not App.wait_ready([app], self.get_timeout()):
+                logger.error("({}) Not ready, skipping the post-up hook".format(app))
+                return
+
             # Run the post-up hook, if any
             Stack.hook("post-up", app)
 
@@ -91,7 +95,7 @@ class Reup(Base):
                         logger.info("({}) Rebuilding image...".format(app))
 
                         # Rebuild images
-                        App.clean_images(docker_client, app)
+                        App.clean_images(app)
 
             # Build and run stack down
             down_command = ["stack", "down"]
@@ -100,15 +104,12 @@ class Reup(Base):
 
             Stack.run(down_command)
 
-            # Run the pre-up hook, if any
-            Stack.hook("pre-up")
-
-            # Build and run stack up
+            # Build and run stack up, which runs the pre-up hook and, once the
+            # services are ready, the post-up hook
             up_command = ["stack", "up"]
             if self.options["-d"]:
-                up_command.append("-d")
-
-            Stack.run(up_command)
+                up_command.extend(["-d", "--timeout={}".format(self.get_timeout())])
 
-            # Run the pre-up hook, if any
-            Stack.hook("post-up")
+            if Stack.run(up_command) != 0:
+                logger.error("Stack could not be brought up")
+                sys.exit(1)
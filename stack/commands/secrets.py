@@ -1,11 +1,11 @@
 """The secrets command."""
 
 import os
-import boto3
 import json
 import base64
-from botocore.exceptions import ClientError
+import sys
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import Stack
 
@@ -19,9 +19,14 @@ headers = """#
 """
 
 
+@register("secrets")
 class Secrets(Base):
     def run(self):
 
+        # AWS libraries are slow to import, only load them when needed
+        import boto3
+        from botocore.exceptions import ClientError
+
         # Get name of secret
         secret_name = Stack.get_secrets_config("name")
         try:
@@ -52,7 +57,7 @@ class Secrets(Base):
                         "(secrets) The .env secrets file already exists."
                         ' Run with "-f" to overwrite.'
                     )
-                    exit(0)
+                    sys.exit(0)
 
             # Determine how to write
             if type(secrets) is dict:
@@ -100,4 +105,4 @@ class Secrets(Base):
 
         except Exception as e:
             logger.exception("Secrets error: {}".format(e))
-            exit(1)
+            sys.exit(1)
@@ -1,8 +1,8 @@
 """The shell command."""
 
-import docker
 import subprocess
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 
@@ -11,18 +11,16 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("shell", docker=True)
 class Shell(Base):
     def run(self):
 
         # Check which shell.
         shell = "/bin/sh" if self.options["--sh"] else "/bin/bash"
 
-        # Get the docker client.
-        docker_client = docker.from_env()
-
         # Determine the app.
         app = self.options["<app>"]
-        if App.check_running(docker_client, app):
+        if App.check_running(app):
 
             # Execute a shell.
             subprocess.call(["docker-compose", "exec", app, shell])
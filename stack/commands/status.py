@@ -1,34 +1,121 @@
 """The status command."""
 
-import docker
+import sys
+import time
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
+from stack.process import format_table
+from stack.snapshot import PROJECT_LABEL, Snapshot
 
 import logging
 
 logger = logging.getLogger("stack")
 
 
+@register("status", docker=True)
 class Status(Base):
     def run(self):
 
         # Get the docker client.
-        docker_client = docker.from_env()
+        docker_client = self.docker_client
+
+        # Check for watching
+        if self.options.get("--watch"):
+            return self.watch()
+
+        # Fetch all containers at once.
+        snapshot = Snapshot.take(docker_client)
 
         # Get the app.
         app = self.options["<app>"]
         if app is not None:
 
             # Check run status
-            logger.info(
-                "({}) Status: {}".format(app, App.get_status(docker_client, app))
-            )
+            logger.info("({}) Status: {}".format(app, self.describe(app, snapshot)))
 
         else:
 
             # Get all app statuses
             for app in App.get_apps():
-                logger.info(
-                    "({}) Status: {}".format(app, App.get_status(docker_client, app))
+                logger.info("({}) Status: {}".format(app, self.describe(app, snapshot)))
+
+    def describe(self, app, snapshot):
+        """Returns the app's status along with its health and uptime, if any"""
+        status = App.get_status(app, snapshot=snapshot)
+
+        # Add details
+        container = snapshot.get_container(App.get_container_name(app) or app)
+        details = []
+        if container is not None and container.health:
+            details.append(container.health)
+        if container is not None and container.uptime:
+            details.append("up {}".format(container.uptime))
+
+        return "{} ({})".format(status, ", ".join(details)) if details else status
+
+    def watch(self):
+        """
+        Shows a table of statuses and updates it from the Docker events
+        stream as containers change, until interrupted
+        """
+        app = self.options["<app>"]
+        apps = [app] if app is not None else App.get_apps()
+
+        # Subscribe from before the snapshot so no change is missed
+        project = Snapshot.get_project_name()
+        since = int(time.time())
+        snapshot = Snapshot.take(self.docker_client, project)
+        events = self.docker_client.events(
+            since=since,
+            decode=True,
+            filters={
+                "type": "container",
+                "label": "{}={}".format(PROJECT_LABEL, project),
+            },
+        )
+
+        lines = self.render(apps, snapshot)
+        try:
+            for event in events:
+                state = snapshot.apply_event(event)
+                if state is not None:
+                    logger.debug("({}) {}".format(state.name, event.get("Action")))
+                    lines = self.render(apps, snapshot, lines)
+
+        except KeyboardInterrupt:
+            pass
+
+        finally:
+            events.close()
+
+    def render(self, apps, snapshot, previous=0):
+        """
+        Writes the status table, replacing the previous one when writing to
+        a terminal
+        :return: The number of lines written
+        """
+        rows = []
+        for app in apps:
+            container = snapshot.get_container(App.get_container_name(app) or app)
+            if container is None:
+                rows.append(["({})".format(app), "not found", "", ""])
+            else:
+                rows.append(
+                    [
+                        "({})".format(app),
+                        container.status,
+                        container.health or "",
+                        container.uptime or "",
+                    ]
                 )
+
+        table = format_table(["App", "Status", "Health", "Uptime"], rows)
+        if previous and sys.stdout.isatty():
+            sys.stdout.write("\x1b[{}F\x1b[J".format(previous))
+
+        sys.stdout.write("\n".join(table) + "\n")
+        sys.stdout.flush()
+
+        return len(table)
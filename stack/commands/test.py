@@ -1,28 +1,32 @@
 """The test command."""
 
-import docker
-
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
+from stack.snapshot import Snapshot
 
 import logging
 
 logger = logging.getLogger("stack")
 
 
+@register("test", docker=True)
 class Test(Base):
     def run(self):
 
         # Get a docker client.
-        docker_client = docker.from_env()
+        docker_client = self.docker_client
+
+        # Fetch all containers and images at once.
+        snapshot = Snapshot.take(docker_client)
 
         # Check all the build parameters.
         apps = App.get_apps()
         for app in apps:
 
             # Check images.
-            if not App.check_docker_images(docker_client, app):
+            if not App.check_docker_images(app, snapshot=snapshot):
                 logger.error(
                     "({}) Container image does not exist, build and"
                     " try again...".format(app)
@@ -30,7 +34,7 @@ class Test(Base):
                 return
 
             # Ensure it is running.
-            if not App.check_running(docker_client, app):
+            if not App.check_running(app, snapshot=snapshot):
                 logger.error(
                     "({}) Container is not running, ensure all containers"
                     " are started...".format(app)
@@ -1,7 +1,8 @@
 """The up command."""
 
-import docker
+import sys
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
@@ -11,14 +12,12 @@ import logging
 logger = logging.getLogger("stack")
 
 
+@register("up", docker=True)
 class Up(Base):
     def run(self):
 
-        # Get the docker client.
-        docker_client = docker.from_env()
-
         # Check it.
-        if not App.check(docker_client):
+        if not App.check():
             logger.critical(
                 "Stack is invalid! Ensure all paths and images are correct"
                 " and try again"
@@ -28,11 +27,15 @@ class Up(Base):
         # Check for clean.
         if self.options["--clean"]:
 
-            App.clean_images(docker_client)
+            App.clean_images()
 
         # Iterate through built apps
-        for app in App.get_built_apps():
-            App.build(app)
+        if self.options["--parallel"]:
+            App.build_many(App.get_built_apps(), self.get_jobs())
+
+        else:
+            for app in App.get_built_apps():
+                App.build(app)
 
         # Build the command.
         command = ["docker-compose", "up"]
@@ -58,5 +61,10 @@ class Up(Base):
 
         Stack.run(command)
 
+        # Wait for services to be healthy before running the post-up hook
+        if self.options["-d"] and not App.wait_ready(timeout=self.get_timeout()):
+            logger.error("Stack is not ready, skipping the post-up hook")
+            sys.exit(1)
+
         # Run the pre-build hook, if any
         Stack.hook("post-up")
@@ -1,16 +1,21 @@
 """The checkout command."""
 
 import os
+import sys
 
+from stack.commands import register
 from stack.commands.base import Base
 from stack.app import App
 from stack.app import Stack
+from stack import process
+from stack import subtree
 
 import logging
 
 logger = logging.getLogger("stack")
 
 
+@register("update", git=True)
 class Update(Base):
     def run(self):
 
@@ -30,14 +35,13 @@ class Update(Base):
             logger.error(
                 "Current working copy has changes, cannot update app repositories"
             )
-            exit(1)
+            sys.exit(1)
 
         logger.info("Will update {}".format(", ".join(apps)))
 
-        # Iterate and update
+        # Get the repo URLs
+        repositories = {}
         for app in apps:
-
-            # Get the repo URL
             repo_url = App.get_repo_url(app)
             branch = App.get_repo_branch(app)
             if repo_url is None or branch is None:
@@ -46,40 +50,60 @@ class Update(Base):
                 )
                 continue
 
-            # Determine the path to the app directory
-            apps_dir = os.path.relpath(Stack.get_config("apps-directory"))
+            repositories[app] = (repo_url, branch)
+
+        # Determine the path to the app directories
+        apps_dir = os.path.relpath(Stack.get_config("apps-directory"))
+
+        # Skip apps whose branch has not moved since they were squashed
+        results = {}
+        heads = subtree.get_remote_heads(repositories, self.get_jobs())
+        splits = subtree.get_splits()
+        for app in repositories:
+            subdir = os.path.join(apps_dir, app)
+            if heads[app] and os.path.isdir(subdir):
+                if heads[app] == splits.get(subdir):
+                    logger.debug("({}) Already at {}".format(app, heads[app][:7]))
+                    results[app] = "up to date"
+
+        # Fetch the others all at once
+        fetched = subtree.fetch_many(
+            {app: r for app, r in repositories.items() if app not in results},
+            self.get_jobs(),
+        )
+
+        # Iterate and update
+        for app in repositories:
+            if app in results:
+                continue
+
+            if app not in fetched:
+                results[app] = "failed"
+                continue
+
             subdir = os.path.join(apps_dir, app)
 
             # Check for pre-checkout hook
             Stack.hook("pre-checkout", app, [os.path.realpath(subdir)])
 
-            # Build the command
-            command = [
-                "git",
-                "subtree",
-                "add",
-                "--prefix={}".format(subdir),
-                repo_url,
-                branch,
-                "--squash",
-            ]
-
-            # Remove the current subtree.
-            Stack.run(["git", "rm", "-rf", subdir])
-            Stack.run(["rm", "-rf", subdir])
-            Stack.run(
-                [
-                    "git",
-                    "commit",
-                    "-m",
-                    '"Stack op: Removing subtree {} for cloning branch {}"'.format(
-                        app, branch
-                    ),
-                ]
-            )
+            # Switch the subtree, only changing the files that differ
+            if not subtree.switch(subdir, subtree.get_ref(app)):
+                results[app] = "failed"
+                continue
 
-            # Run the command.
-            Stack.run(command)
+            results[app] = "updated"
 
             # Check for post-checkout hook
             Stack.hook("post-checkout", app, [os.path.realpath(subdir)])
+
+        # Summarize
+        rows = [["({})".format(app), results[app]] for app in repositories]
+        for line in process.format_table(["App", "Result"], rows):
+            logger.info(line)
+
+        logger.info(
+            "Apps updated: {}, already up to date: {}".format(
+                sum(result == "updated" for result in results.values()),
+                sum(result == "up to date" for result in results.values()),
+            )
+        )
@@ -0,0 +1,24 @@
+"""The wait command."""
+
+import sys
+
+from stack.commands import register
+from stack.commands.base import Base
+from stack.app import App
+
+import logging
+
+logger = logging.getLogger("stack")
+
+
+@register("wait", docker=True)
+class Wait(Base):
+    def run(self):
+
+        # Wait for the apps, or all of them.
+        if App.wait_ready(self.options["<apps>"], self.get_timeout()):
+            logger.info("The Stack is ready!")
+
+        else:
+            logger.error("Timed out waiting for the Stack to be ready")
+            sys.exit(1)
@@ -0,0 +1,245 @@
+"""
+Parsed and cached views of the Stack's configuration files.
+"""
+import hashlib
+import os
+import pickle
+from collections import OrderedDict
+
+import yaml
+
+import logging
+
+logger = logging.getLogger("stack")
+
+COMPOSE_FILE = "docker-compose.yml"
+STACK_FILE = "stack.yml"
+
+# Where compiled snapshots of the configuration are kept, relative to the root
+CACHE_DIR = os.path.join(".stack", "cache")
+
+# Bump this whenever the pickled model changes shape
+SNAPSHOT_VERSION = "1"
+
+
+class ServiceConfig(object):
+    """A single service as defined in docker-compose.yml"""
+
+    def __init__(self, name, config):
+        self.name = name
+        self.config = config or {}
+
+    def get(self, property, default=None):
+        return self.config.get(property, default)
+
+    @property
+    def image(self):
+        return self.config.get("image")
+
+    @property
+    def container_name(self):
+        return self.config.get("container_name")
+
+    @property
+    def build(self):
+        return self.config.get("build")
+
+    @property
+    def build_dir(self):
+
+        # Check for a dict
+        build = self.build
+        if build and type(build) is dict:
+            return build.get("context")
+        else:
+            return build
+
+    @property
+    def dockerfile(self):
+
+        # Relative to the build context
+        build = self.build
+        if build and type(build) is dict:
+            return build.get("dockerfile") or "Dockerfile"
+        else:
+            return "Dockerfile"
+
+    @property
+    def labels(self):
+        return self.config.get("labels") or {}
+
+    @property
+    def depends_on(self):
+
+        # Can be either a list of services or a dict of conditions
+        return list(self.config.get("depends_on") or [])
+
+
+class StackConfig(object):
+    """
+    The combined contents of docker-compose.yml and stack.yml. Instances are
+    loaded through StackConfig.load() which only parses the files again when
+    their modification time or size has changed.
+    """
+
+    # How many times a configuration file was parsed from YAML
+    parse_count = 0
+
+    # Loaded configs keyed by stack root
+    _cache = {}
+
+    def __init__(self, compose=None, stack=None):
+        self.compose = compose or {}
+        self.stack = stack
+
+        # Build the services
+        self.services = OrderedDict(
+            (name, ServiceConfig(name, config))
+            for name, config in (self.compose.get("services") or {}).items()
+        )
+
+    @property
+    def apps(self):
+        return list(self.services.keys())
+
+    def get(self, property):
+        """
+        Get a property from the 'stack' section of stack.yml
+        :param property: The key of the property
+        :return: The value, or None if not set or the file is missing
+        """
+        if self.stack is None:
+            return None
+
+        return self.stack.get(property)
+
+    def get_service(self, app):
+        return self.services.get(app)
+
+    def get_app_config(self, app, property):
+        """
+        Get a property for an app from the 'apps' section of stack.yml
+        """
+        apps = self.get("apps") or {}
+        return (apps.get(app) or {}).get(property)
+
+    @classmethod
+    def load(cls, root):
+        """
+        Returns the configuration for the Stack at the given root. Files are
+        only parsed again if they changed since the last load, and parsed
+        configurations are kept as compiled snapshots in .stack/cache so later
+        invocations can skip YAML parsing entirely.
+        :param root: The root directory of the Stack
+        :type root: str
+        :rtype: StackConfig
+        """
+        compose_path = os.path.join(root, COMPOSE_FILE)
+        stack_path = os.path.join(root, STACK_FILE)
+
+        # Check the cache
+        key = (cls._stat(compose_path), cls._stat(stack_path))
+        cached = cls._cache.get(root)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+        # Read the files and check for a snapshot of their contents
+        compose = cls._read(compose_path)
+        stack = cls._read(stack_path)
+        snapshot = cls._snapshot_path(root, compose, stack)
+
+        config = cls._load_snapshot(snapshot)
+        if config is None:
+
+            # Parse the files
+            compose = cls._parse(compose_path, compose)
+            stack = cls._parse(stack_path, stack)
+
+            config = cls(compose, stack.get("stack") if stack is not None else None)
+            cls._save_snapshot(snapshot, config)
+
+        cls._cache[root] = (key, config)
+
+        return config
+
+    @classmethod
+    def invalidate(cls, root=None):
+        if root is None:
+            cls._cache.clear()
+        else:
+            cls._cache.pop(root, None)
+
+    @staticmethod
+    def _stat(path):
+        try:
+            stat = os.stat(path)
+            return stat.st_mtime_ns, stat.st_size
+
+        except OSError:
+            return None
+
+    @staticmethod
+    def _read(path):
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+
+        except OSError:
+            return None
+
+    @classmethod
+    def _parse(cls, path, content):
+        if content is None:
+            return None
+
+        logger.debug("Parsing configuration file: {}".format(path))
+        cls.parse_count += 1
+        return yaml.load(content, Loader=yaml.FullLoader) or {}
+
+    @staticmethod
+    def _snapshot_path(root, compose, stack):
+
+        # Key the snapshot by the contents of both files
+        digest = hashlib.sha256(SNAPSHOT_VERSION.encode())
+        for content in (compose, stack):
+            digest.update(b"\0" if content is None else b"\1" + content)
+
+        return os.path.join(
+            root, CACHE_DIR, "config-{}.pickle".format(digest.hexdigest()[:32])
+        )
+
+    @staticmethod
+    def _load_snapshot(path):
+        try:
+            with open(path, "rb") as f:
+                config = pickle.load(f)
+
+            logger.debug("Loaded configuration snapshot: {}".format(path))
+            return config
+
+        except FileNotFoundError:
+            return None
+
+        except Exception as e:
+            logger.debug("Ignoring unreadable snapshot {}: {}".format(path, e))
+            return None
+
+    @staticmethod
+    def _save_snapshot(path, config):
+        directory = os.path.dirname(path)
+        try:
+            os.makedirs(directory, exist_ok=True)
+
+            # Remove snapshots of previous versions of the files
+            for name in os.listdir(directory):
+                if name.startswith("config-") and name.endswith(".pickle"):
+                    os.remove(os.path.join(directory, name))
+
+            # Write it atomically so concurrent invocations never see half a file
+            temp = "{}.{}.tmp".format(path, os.getpid())
+            with open(temp, "wb") as f:
+                pickle.dump(config, f, protocol=pickle.HIGHEST_PROTOCOL)
+            os.replace(temp, path)
+
+        except OSError as e:
+            logger.debug("Could not save configuration snapshot: {}".format(e))
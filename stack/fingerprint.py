@@ -0,0 +1,193 @@
+"""
+Fingerprints of files and directories, used to skip work whose inputs have
+not changed since it last ran.
+"""
+import fnmatch
+import hashlib
+import json
+import os
+import threading
+
+import logging
+
+logger = logging.getLogger("stack")
+
+
+class Manifest(object):
+    """
+    A JSON file recording fingerprints between invocations. Instances are
+    shared per path and safe to update from several threads.
+    """
+
+    _manifests = {}
+    _lock = threading.Lock()
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+
+        try:
+            with open(path, "r") as f:
+                self.entries = json.load(f)
+
+        except (OSError, ValueError):
+            self.entries = {}
+
+    @classmethod
+    def load(cls, path):
+        with cls._lock:
+            if path not in cls._manifests:
+                cls._manifests[path] = cls(path)
+
+            return cls._manifests[path]
+
+    def get(self, key):
+        with self.lock:
+            return self.entries.get(key)
+
+    def set(self, key, value):
+        """Records the entry and writes the manifest to disk"""
+        with self.lock:
+            self.entries[key] = value
+
+            try:
+                os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+                temp = "{}.{}.tmp".format(self.path, os.getpid())
+                with open(temp, "w") as f:
+                    json.dump(self.entries, f, indent=1, sort_keys=True)
+                os.replace(temp, self.path)
+
+            except OSError as e:
+                logger.warning("Could not save {}: {}".format(self.path, e))
+
+
+class DockerIgnore(object):
+    """Matches paths against the patterns of a .dockerignore file"""
+
+    def __init__(self, patterns):
+        self.patterns = []
+        for pattern in patterns:
+            pattern = pattern.strip()
+            if not pattern or pattern.startswith("#"):
+                continue
+
+            exclude = not pattern.startswith("!")
+            pattern = os.path.normpath(pattern.lstrip("!").strip()).lstrip("/")
+            self.patterns.append((pattern.split("/"), exclude))
+
+        # Without exceptions, ignored directories can be skipped entirely
+        self.has_exceptions = any(not exclude for _, exclude in self.patterns)
+
+    @classmethod
+    def from_file(cls, path):
+        try:
+            with open(path, "r") as f:
+                return cls(f.readlines())
+
+        except OSError:
+            return cls([])
+
+    def ignored(self, path):
+        """
+        Returns whether the path, relative to the context, is ignored
+        :param path: A '/' separated relative path
+        :rtype: bool
+        """
+        ignored = False
+        parts = path.split("/")
+        for pattern, exclude in self.patterns:
+
+            # A pattern matching a directory matches everything beneath it
+            if any(self.match(pattern, parts[:i]) for i in range(1, len(parts) + 1)):
+                ignored = exclude
+
+        return ignored
+
+    @staticmethod
+    def match(pattern, parts):
+        """
+        Returns whether the split path matches the split pattern. As in
+        Docker, wildcards only match within a path segment, and only '**'
+        matches any number of segments.
+        :param pattern: The segments of the pattern
+        :param parts: The segments of the path
+        :rtype: bool
+        """
+        if not pattern:
+            return not parts
+
+        if pattern[0] == "**":
+            return any(
+                DockerIgnore.match(pattern[1:], parts[i:])
+                for i in range(len(parts) + 1)
+            )
+
+        return (
+            bool(parts)
+            and fnmatch.fnmatchcase(parts[0], pattern[0])
+            and DockerIgnore.match(pattern[1:], parts[1:])
+        )
+
+
+def hash_file(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+
+    return digest.hexdigest()
+
+
+def fingerprint_tree(root, ignore=None, previous=None, extra=None):
+    """
+    Fingerprints the files beneath root. Files whose modification time and
+    size match those recorded in previous are not read again.
+    :param root: The directory or file to fingerprint
+    :param ignore: A DockerIgnore for paths to leave out
+    :param previous: The files dict returned by a previous call
+    :param extra: Any other JSON serializable inputs to include
+    :return: The fingerprint and a dict of the files it covers, to pass as
+     previous next time
+    :rtype: tuple
+    """
+    previous = previous or {}
+    files = {}
+
+    def add(path, relative):
+        stat = os.stat(path)
+        record = previous.get(relative)
+        if record and record[0] == stat.st_mtime_ns and record[1] == stat.st_size:
+            files[relative] = record
+        else:
+            files[relative] = [stat.st_mtime_ns, stat.st_size, hash_file(path)]
+
+    if os.path.isfile(root):
+        add(root, os.path.basename(root))
+
+    for directory, dirs, names in os.walk(root):
+        relative_dir = os.path.relpath(directory, root).replace(os.sep, "/")
+        relative_dir = "" if relative_dir == "." else relative_dir + "/"
+
+        # Prune ignored directories when nothing inside can be re-included
+        if ignore is not None and not ignore.has_exceptions:
+            dirs[:] = [d for d in dirs if not ignore.ignored(relative_dir + d)]
+        dirs.sort()
+
+        for name in sorted(names):
+            relative = relative_dir + name
+            path = os.path.join(directory, name)
+            if ignore is not None and ignore.ignored(relative):
+                continue
+
+            if os.path.isfile(path):
+                add(path, relative)
+
+    # Combine them
+    digest = hashlib.sha256()
+    for relative in sorted(files):
+        digest.update("{}\0{}\0".format(relative, files[relative][2]).encode())
+    if extra is not None:
+        digest.update(json.dumps(extra, sort_keys=True).encode())
+
+    return digest.hexdigest(), files
@@ -0,0 +1,161 @@
+"""
+Finding and running the scripts of the hooks directory. The directory is
+listed once per invocation, and hooks defining a run() function can be
+called in-process rather than in a new interpreter.
+"""
+import ast
+import hashlib
+import importlib.util
+import json
+import os
+import threading
+
+from stack.fingerprint import fingerprint_tree
+
+import logging
+
+logger = logging.getLogger("stack")
+
+
+class HookIndex(object):
+    """
+    The hook scripts of a directory, keyed by step. Instances are shared per
+    directory, so steps without a script are only looked for once.
+    """
+
+    _indexes = {}
+    _lock = threading.Lock()
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.lock = threading.Lock()
+        self.entry_points = {}
+
+        try:
+            names = sorted(os.listdir(directory))
+
+        except OSError:
+            names = []
+
+        self.scripts = {
+            name[: -len(".py")]: os.path.join(directory, name)
+            for name in names
+            if name.endswith(".py") and os.path.isfile(os.path.join(directory, name))
+        }
+
+    @classmethod
+    def load(cls, directory):
+        with cls._lock:
+            if directory not in cls._indexes:
+                cls._indexes[directory] = cls(directory)
+
+            return cls._indexes[directory]
+
+    @classmethod
+    def invalidate(cls):
+        with cls._lock:
+            cls._indexes.clear()
+
+    def get(self, step):
+        """Returns the path to the step's script, or None if there is none"""
+        return self.scripts.get(step)
+
+    def get_entry_point(self, step):
+        """
+        Imports the step's script, the first time only, and returns its run()
+        function. Scripts without a top level run() function are not imported
+        at all, since they do their work when executed.
+        :param step: The name of the hook
+        :return: The function, or None if the script must run in a subprocess
+        """
+        with self.lock:
+            if step not in self.entry_points:
+                self.entry_points[step] = self.import_entry_point(step)
+
+            return self.entry_points[step]
+
+    def import_entry_point(self, step):
+        path = self.get(step)
+        if path is None:
+            return None
+
+        # Check for the function without running anything
+        try:
+            with open(path, "rb") as f:
+                tree = ast.parse(f.read(), path)
+
+        except (OSError, SyntaxError) as e:
+            logger.debug("(stack) Could not parse hook '{}': {}".format(step, e))
+            return None
+
+        if not any(
+            isinstance(node, ast.FunctionDef) and node.name == "run"
+            for node in tree.body
+        ):
+            logger.debug("(stack) Hook '{}' has no run() function".format(step))
+            return None
+
+        name = "stack_hooks.{}".format(step.replace("-", "_"))
+        spec = importlib.util.spec_from_file_location(name, path)
+        module = importlib.util.module_from_spec(spec)
+        try:
+            spec.loader.exec_module(module)
+
+        except Exception:
+            logger.exception("(stack) Could not import hook '{}'".format(step))
+            return None
+
+        return module.run
+
+
+def call(step, entry_point, arguments):
+    """
+    Calls a hook's run() function with the app and any other arguments
+    :param step: The name of the hook
+    :param entry_point: The run() function
+    :param arguments: The arguments to pass
+    :return: The exit code, 0 unless run() returned or exited with another
+    :rtype: int
+    """
+    try:
+        code = entry_point(*arguments)
+
+    except SystemExit as e:
+        code = e.code if e.code is None or isinstance(e.code, int) else 1
+
+    except Exception:
+        logger.exception("(stack) Hook '{}' failed".format(step))
+        return 1
+
+    return code if isinstance(code, int) else 0
+
+
+def fingerprint_inputs(root, paths, previous=None, extra=None):
+    """
+    Fingerprints the paths a hook declares as its inputs
+    :param root: The directory the paths are relative to
+    :param paths: The files and directories to fingerprint
+    :param previous: The files dict returned by a previous call
+    :param extra: Any other JSON serializable inputs to include
+    :return: The fingerprint and a dict of the files of each path, to pass as
+     previous next time
+    :rtype: tuple
+    """
+    previous = previous or {}
+    digests = {}
+    files = {}
+    for path in paths:
+        full_path = os.path.join(root, path)
+        if not os.path.exists(full_path):
+            digests[path] = None
+            continue
+
+        digests[path], files[path] = fingerprint_tree(
+            full_path, previous=previous.get(path)
+        )
+
+    digest = hashlib.sha256(
+        json.dumps({"paths": digests, "extra": extra}, sort_keys=True).encode()
+    )
+
+    return digest.hexdigest(), files
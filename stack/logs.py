@@ -0,0 +1,279 @@
+"""
+Searching and following container logs line by line as they are streamed,
+rather than loading a container's whole history into memory at once.
+"""
+import calendar
+import math
+import re
+import threading
+import time
+from collections import deque
+
+from stack.process import LineSplitter
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# How many lines to fetch at first when searching from the tail backwards
+TAIL_WINDOW = 1000
+
+# How many seconds to hold lines back so lines written at the same time by
+# other containers can be put in order
+REORDER_WINDOW = 0.2
+
+# How many lines to buffer for each container when following logs
+BUFFER_SIZE = 10000
+
+
+def compile_pattern(pattern):
+    """Compiles a str or bytes pattern for matching raw lines of logs"""
+    if isinstance(pattern, str):
+        pattern = pattern.encode()
+
+    return re.compile(pattern)
+
+
+def iter_lines(chunks):
+    """Yields the complete lines, without newlines, of a stream of bytes"""
+    splitter = LineSplitter()
+    for chunk in chunks:
+        for line in splitter.feed(chunk):
+            yield line
+
+    for line in splitter.flush():
+        yield line
+
+
+def scan(container, pattern, since=None, tail="all", follow=False):
+    """
+    Streams the container's logs and yields a match for each matching line,
+    oldest first. Only one chunk of the logs is held in memory at a time,
+    and the stream is closed as soon as the caller stops iterating.
+    :param container: The container
+    :param pattern: The regular expression to look for in each line
+    :param since: Only search logs since this datetime or timestamp
+    :param tail: Only search this many lines from the end, or 'all'
+    :param follow: Whether to keep searching new output as it is written
+    :return: The matches, whose string is the line they were found in
+    """
+    pattern = compile_pattern(pattern)
+    stream = container.logs(stream=True, follow=follow, since=since, tail=tail)
+    try:
+        for line in iter_lines(stream):
+            match = pattern.search(line)
+            if match:
+                yield match
+
+    finally:
+        stream.close()
+
+
+def get_timestamp(line):
+    """
+    Returns the Unix time of the RFC 3339 timestamp Docker adds at the start
+    of a line, rounded up to the next microsecond
+    """
+    timestamp = line.split(b" ", 1)[0].rstrip(b"Z").decode()
+    seconds, _, fraction = timestamp.partition(".")
+
+    return (
+        calendar.timegm(time.strptime(seconds, "%Y-%m-%dT%H:%M:%S"))
+        + math.ceil(float("0." + (fraction or "0")) * 1e6) / 1e6
+    )
+
+
+def search_backwards(container, pattern, since=None, tail="all", window=None):
+    """
+    Finds the most recent matching line by fetching ever larger windows from
+    the tail of the container's logs, each twice the size of the last, and
+    only checking the lines the previous window did not cover. Every window
+    ends at the last line of the first one, so lines written in the meantime
+    do not shift them, and doubling them keeps the lines fetched to about
+    twice those searched.
+    :param container: The container
+    :param pattern: The regular expression to look for in each line
+    :param since: Only search logs since this datetime or timestamp
+    :param tail: Only search this many lines from the end, or 'all'
+    :param window: How many lines to fetch at first
+    :return: The match, if any
+    """
+    pattern = compile_pattern(pattern)
+    limit = None if tail == "all" else int(tail)
+    window = window or TAIL_WINDOW
+    until = None
+    scanned = 0
+    while True:
+        if limit is not None:
+            window = min(window, limit)
+
+        lines = container.logs(
+            timestamps=True, since=since, until=until, tail=window
+        ).split(b"\n")
+        if lines and not lines[-1]:
+            lines.pop()
+
+        # Anchor the next windows at the end of the first one
+        if until is None and lines:
+            until = get_timestamp(lines[-1])
+
+        for line in reversed(lines[: max(0, len(lines) - scanned)]):
+            match = pattern.search(line.split(b" ", 1)[-1])
+            if match:
+                return match
+
+        # Stop at the start of the logs
+        if len(lines) < window or window == limit:
+            return None
+
+        scanned = len(lines)
+        window *= 2
+
+
+def search(container, pattern, since=None, tail="all", latest=False):
+    """
+    Finds the first line of the container's logs matching the pattern, or
+    the last one if latest is set
+    :param container: The container
+    :param pattern: The regular expression to look for in each line
+    :param since: Only search logs since this datetime or timestamp
+    :param tail: Only search this many lines from the end, or 'all'
+    :param latest: Whether to search from the tail backwards
+    :return: The match, if any
+    """
+    if latest:
+        return search_backwards(container, pattern, since, tail)
+
+    matches = scan(container, pattern, since, tail)
+    try:
+        return next(matches, None)
+
+    finally:
+        matches.close()
+
+
+def get_sort_key(line):
+    """
+    Returns a key ordering lines by the RFC 3339 timestamp Docker adds at
+    their start, whose fraction of a second has its trailing zeros removed
+    """
+    timestamp = line.split(b" ", 1)[0].rstrip(b"Z")
+    seconds, _, fraction = timestamp.partition(b".")
+
+    return seconds + b"." + fraction.ljust(9, b"0")
+
+
+class LogMerger(object):
+    """
+    Follows the logs of several containers at once, each over its own
+    connection, and merges their lines in the order they were written.
+    Lines are held back for a short window so that lines written at the same
+    time by other containers can be put before them. Each container's lines
+    are buffered in a ring buffer, so a container writing faster than the
+    lines can be displayed drops its oldest lines rather than using ever
+    more memory.
+    """
+
+    def __init__(self, window=REORDER_WINDOW, buffer_size=BUFFER_SIZE):
+        self.window = window
+        self.buffer_size = buffer_size
+        self.condition = threading.Condition()
+        self.buffers = {}
+        self.dropped = {}
+        self.streams = []
+        self.running = 0
+
+    def start(self, containers, since=None, tail="all"):
+        """
+        Starts following the containers' logs
+        :param containers: Maps a name for each container to the container
+        :param since: Only show logs since this datetime or timestamp
+        :param tail: How many lines to show from the end of each log first
+        """
+        for name, container in containers.items():
+            self.buffers[name] = deque(maxlen=self.buffer_size)
+            self.dropped[name] = 0
+            self.running += 1
+
+            stream = container.logs(
+                stream=True, follow=True, timestamps=True, since=since, tail=tail
+            )
+            self.streams.append(stream)
+
+            thread = threading.Thread(target=self.read, args=(name, stream))
+            thread.daemon = True
+            thread.start()
+
+    def read(self, name, stream):
+        try:
+            for line in iter_lines(stream):
+                with self.condition:
+                    buffer = self.buffers[name]
+                    if len(buffer) == buffer.maxlen:
+                        self.dropped[name] += 1
+
+                    buffer.append((get_sort_key(line), time.monotonic(), line))
+                    self.condition.notify()
+
+        except Exception as e:
+            logger.debug("({}) Log stream ended: {}".format(name, e))
+
+        finally:
+            with self.condition:
+                self.running -= 1
+                self.condition.notify()
+
+    def batches(self):
+        """
+        Yields lists of (name, line) tuples, in order, as soon as they are out
+        of the reorder window, until every stream has ended
+        """
+        while True:
+            with self.condition:
+                batch = self.take()
+                while not batch:
+                    if not self.running and not any(self.buffers.values()):
+                        return
+
+                    self.condition.wait(self.window)
+                    batch = self.take()
+
+                # Report lines lost to a full buffer
+                for name, dropped in self.dropped.items():
+                    if dropped:
+                        logger.warning(
+                            "({}) Logs are too fast to display, skipped {}"
+                            " lines".format(name, dropped)
+                        )
+                        self.dropped[name] = 0
+
+            yield batch
+
+    def take(self):
+        """Removes and returns the lines that are ready, in order"""
+        batch = []
+        now = time.monotonic()
+        while True:
+            heads = [
+                (buffer[0][0], name) for name, buffer in self.buffers.items() if buffer
+            ]
+            if not heads:
+                return batch
+
+            # Wait for the oldest line to leave the window, unless all ended
+            _, name = min(heads)
+            _, received, line = self.buffers[name][0]
+            if self.running and now - received < self.window:
+                return batch
+
+            self.buffers[name].popleft()
+            batch.append((name, line))
+
+    def close(self):
+        """Closes every stream"""
+        for stream in self.streams:
+            try:
+                stream.close()
+
+            except Exception as e:
+                logger.debug("Could not close log stream: {}".format(e))
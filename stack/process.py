@@ -0,0 +1,254 @@
+"""
+Running subprocesses and streaming their output to the logger.
+"""
+import itertools
+import os
+import selectors
+import subprocess
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from functools import partial
+from logging import DEBUG, ERROR
+
+from colorlog.escape_codes import escape_codes
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# How many bytes to read from a pipe at a time
+CHUNK_SIZE = 64 * 1024
+
+# Colors used to tell apart the output of concurrently run commands
+PREFIX_COLORS = ("blue", "purple", "cyan", "yellow", "light_blue", "light_purple")
+
+# The outcome of one of the commands run by run_many()
+Result = namedtuple("Result", ["name", "args", "code", "duration"])
+
+
+class LineSplitter(object):
+    """Splits chunks of bytes read from a stream into complete lines"""
+
+    def __init__(self):
+        self.buffer = b""
+
+    def feed(self, data):
+        """
+        Adds a chunk and returns any lines it completed, without newlines
+        :param data: The bytes read from the stream
+        :type data: bytes
+        :rtype: list
+        """
+        lines = (self.buffer + data).split(b"\n")
+        self.buffer = lines.pop()
+
+        return lines
+
+    def flush(self):
+        """Returns what is left of an unterminated last line, if anything"""
+        line, self.buffer = self.buffer, b""
+
+        return [line] if line else []
+
+
+def stream(args, handler, **kwargs):
+    """
+    Runs the command and passes its output to the handler as it is produced.
+    Both pipes are drained in chunks as soon as they are readable so a child
+    filling one pipe never stalls while the other is quiet.
+    :param args: The command to run
+    :param handler: Called as handler(level, lines) with a list of complete
+     lines (bytes) read from stdout (DEBUG) or stderr (ERROR)
+    :param kwargs: Passed to subprocess.Popen
+    :return: The exit code of the command
+    :rtype: int
+    """
+    child = subprocess.Popen(
+        args, stdout=subprocess.PIPE, stderr=subprocess.PIPE, **kwargs
+    )
+
+    selector = selectors.DefaultSelector()
+    selector.register(child.stdout, selectors.EVENT_READ, (DEBUG, LineSplitter()))
+    selector.register(child.stderr, selectors.EVENT_READ, (ERROR, LineSplitter()))
+
+    try:
+        # Read until both pipes are closed
+        while selector.get_map():
+            for key, _ in selector.select():
+                level, splitter = key.data
+
+                data = os.read(key.fd, CHUNK_SIZE)
+                if data:
+                    lines = splitter.feed(data)
+
+                else:
+                    selector.unregister(key.fileobj)
+                    key.fileobj.close()
+                    lines = splitter.flush()
+
+                if lines:
+                    handler(level, lines)
+
+    finally:
+        selector.close()
+
+    return child.wait()
+
+
+def log_lines(level, lines, prefix=None):
+    """
+    Logs a batch of lines as a single record, skipping the decoding entirely
+    if the logger would discard it anyway
+    """
+    if not logger.isEnabledFor(level):
+        return
+
+    message = b"\n".join(lines).decode(errors="replace")
+    if prefix is not None:
+        message = "\n".join(prefix + line for line in message.split("\n"))
+
+    logger.log(level, message)
+
+
+def get_prefix(name, color="blue"):
+    """Returns the colored '(name) ' prefix for lines of a command's output"""
+    return "{}({}){} ".format(escape_codes[color], name, escape_codes["reset"])
+
+
+def run(args, passthrough=False, prefix=None, **kwargs):
+    """
+    Variant of subprocess.call that logs stdout messages via logger.debug and
+    stderr messages via logger.error.
+    :param args: The command to run
+    :param passthrough: Whether the child should write to our terminal
+     directly rather than through the logger, for output that is only
+     being displayed
+    :param prefix: A prefix to add to every logged line
+    :param kwargs: Passed to subprocess.Popen
+    :return: The exit code of the command
+    :rtype: int
+    """
+    if passthrough:
+        return subprocess.call(args, **kwargs)
+
+    return stream(args, partial(log_lines, prefix=prefix), **kwargs)
+
+
+def run_many(commands, concurrency=None, **kwargs):
+    """
+    Runs the commands concurrently, logging their output line by line with a
+    colored '(name)' prefix for each command.
+    :param commands: The commands to run, as (name, args) pairs
+    :param concurrency: How many commands may run at once, defaults to the
+     number of CPUs
+    :param kwargs: Passed to subprocess.Popen for every command
+    :return: The results of the commands, in the order they were given
+    :rtype: list of Result
+    """
+    commands = list(commands)
+    if not commands:
+        return []
+
+    def run_one(name, args, color):
+        start = time.monotonic()
+        try:
+            code = run(args, prefix=get_prefix(name, color), **kwargs)
+
+        except OSError as e:
+            # Fail only this command, as a shell would if it is not found
+            logger.error("({}) Could not run {}: {}".format(name, args, e))
+            code = 127
+
+        return Result(name, args, code, time.monotonic() - start)
+
+    workers = min(concurrency or os.cpu_count() or 1, len(commands))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        futures = [
+            executor.submit(run_one, name, args, color)
+            for (name, args), color in zip(commands, itertools.cycle(PREFIX_COLORS))
+        ]
+
+        return [future.result() for future in futures]
+
+
+def run_graph(items, dependencies, worker, concurrency=None):
+    """
+    Calls the worker for each item on a thread pool, only starting an item
+    once everything it depends on has finished successfully. Items whose
+    dependencies failed are skipped.
+    :param items: The items to process
+    :param dependencies: Maps an item to the items it depends on; anything
+     not in items is ignored
+    :param worker: Called as worker(item), returns whether it succeeded
+    :param concurrency: How many items may be processed at once, defaults to
+     the number of CPUs
+    :return: Maps each item to a Result, whose code is 0 on success, 1 on
+     failure and None if the item was skipped
+    :rtype: dict
+    """
+    items = list(items)
+    pending = {
+        item: set(d for d in dependencies.get(item, ()) if d in items and d != item)
+        for item in items
+    }
+    results = {}
+
+    def run_one(item):
+        start = time.monotonic()
+        succeeded = worker(item)
+
+        return Result(item, None, 0 if succeeded else 1, time.monotonic() - start)
+
+    workers = max(1, min(concurrency or os.cpu_count() or 1, len(items)))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        running = {}
+        while pending or running:
+
+            # Skip anything depending on a failure
+            for item, waiting in list(pending.items()):
+                if any(results.get(d) and results[d].code != 0 for d in waiting):
+                    logger.error("({}) Skipping, a dependency failed".format(item))
+                    results[item] = Result(item, None, None, 0)
+                    del pending[item]
+
+            # Start anything that is ready
+            for item, waiting in list(pending.items()):
+                if all(d in results for d in waiting):
+                    running[executor.submit(run_one, item)] = item
+                    del pending[item]
+
+            if not running:
+                if pending:
+                    raise ValueError(
+                        "Circular dependency between: {}".format(
+                            ", ".join(str(item) for item in pending)
+                        )
+                    )
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                results[running.pop(future)] = future.result()
+
+    return results
+
+
+def format_table(headers, rows):
+    """
+    Formats rows of values as a plain text table
+    :param headers: The column titles
+    :param rows: Lists of values, one per column
+    :return: The lines of the table
+    :rtype: list
+    """
+    rows = [[str(value) for value in row] for row in rows]
+    widths = [
+        max(len(str(header)), *(len(row[i]) for row in rows)) if rows else len(header)
+        for i, header in enumerate(headers)
+    ]
+
+    return [
+        "  ".join(value.ljust(width) for value, width in zip(row, widths)).rstrip()
+        for row in [list(headers)] + rows
+    ]
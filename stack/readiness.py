@@ -0,0 +1,107 @@
+"""
+Waiting for containers to become healthy, watching all of them at once
+through the Docker events stream.
+"""
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# How long to wait for containers by default, in seconds
+DEFAULT_TIMEOUT = 300
+
+
+def get_readiness(attrs):
+    """
+    Returns the readiness of a container from its inspect attributes:
+    'healthy' if its healthcheck passes, 'running' if it has no healthcheck
+    but is running, and otherwise its health or status
+    :rtype: str
+    """
+    state = attrs.get("State") or {}
+    health = (state.get("Health") or {}).get("Status")
+    if health:
+        return health
+
+    return "running" if state.get("Running") else state.get("Status") or "unknown"
+
+
+def is_ready(readiness):
+    return readiness in ("healthy", "running")
+
+
+def wait(docker_client, containers, timeout=DEFAULT_TIMEOUT):
+    """
+    Waits until every container is healthy, or running if it has no
+    healthcheck, or until the timeout passes.
+    :param docker_client: The Docker client
+    :param containers: Maps each app to its container name
+    :param timeout: How many seconds to wait for
+    :return: Maps each app to a (readiness, seconds until ready) tuple, where
+     seconds is None if the container never became ready
+    :rtype: dict
+    """
+    if not containers:
+        return {}
+
+    start = time.time()
+    deadline = start + timeout
+    apps = {name: app for app, name in containers.items()}
+    results = {app: ("not found", None) for app in containers}
+
+    def update(app, readiness):
+        elapsed = time.time() - start if is_ready(readiness) else None
+        if results[app][1] is None or not is_ready(readiness):
+            results[app] = (readiness, elapsed)
+
+    def pending():
+        return [app for app, result in results.items() if not is_ready(result[0])]
+
+    def inspect(name):
+        try:
+            return get_readiness(docker_client.api.inspect_container(name))
+
+        except Exception as e:
+            logger.debug("({}) Could not inspect container: {}".format(name, e))
+            return "not found"
+
+    # Subscribe before inspecting so no transition is missed
+    events = docker_client.events(
+        since=int(start),
+        until=int(deadline) + 1,
+        decode=True,
+        filters={"type": "container", "container": list(apps)},
+    )
+
+    try:
+        # Check the current state of every container at once
+        with ThreadPoolExecutor(max_workers=max(1, len(apps))) as executor:
+            for name, readiness in zip(apps, executor.map(inspect, list(apps))):
+                update(apps[name], readiness)
+
+        # Follow transitions until everything is ready or time runs out
+        while pending() and time.time() < deadline:
+            event = next(events, None)
+            if event is None:
+                break
+
+            name = ((event.get("Actor") or {}).get("Attributes") or {}).get("name")
+            action = event.get("Action") or event.get("status") or ""
+            if name not in apps:
+                continue
+
+            if action.startswith("health_status"):
+                update(apps[name], action.split(":", 1)[1].strip())
+
+            elif action == "start":
+                update(apps[name], inspect(name))
+
+            elif action in ("die", "stop", "destroy"):
+                update(apps[name], "exited")
+
+    finally:
+        events.close()
+
+    return results
@@ -0,0 +1,231 @@
+"""
+A point in time view of the Stack's containers and images, fetched with a
+single request for each rather than one request per app.
+"""
+import os
+import re
+import time
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# Labels docker-compose sets on the containers it creates
+PROJECT_LABEL = "com.docker.compose.project"
+SERVICE_LABEL = "com.docker.compose.service"
+
+# The container status each event action leaves the container in
+EVENT_STATUSES = {
+    "create": "created",
+    "start": "running",
+    "restart": "running",
+    "unpause": "running",
+    "pause": "paused",
+    "die": "exited",
+    "stop": "exited",
+}
+
+
+def format_duration(seconds):
+    """Returns a rough duration, e.g. '3 minutes'"""
+    for unit, size in (("day", 86400), ("hour", 3600), ("minute", 60)):
+        if seconds >= size:
+            count = int(seconds // size)
+            return "{} {}{}".format(count, unit, "s" if count > 1 else "")
+
+    return "{} seconds".format(max(0, int(seconds)))
+
+
+def read_env_file(path):
+    """
+    Returns the variables set in an env file, as docker-compose reads its
+    .env file
+    :param path: The path of the file
+    :return: The variables, empty if there is no file
+    :rtype: dict
+    """
+    variables = {}
+    try:
+        with open(path) as f:
+            lines = f.read().splitlines()
+
+    except (OSError, UnicodeDecodeError):
+        return variables
+
+    for line in lines:
+        line = line.strip()
+        if not line or line.startswith("#") or "=" not in line:
+            continue
+
+        key, _, value = line.partition("=")
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] and value[0] in "'\"":
+            value = value[1:-1]
+
+        variables[key.strip()] = value
+
+    return variables
+
+
+class ContainerState(object):
+    """The state of a container as reported by the container list endpoint"""
+
+    def __init__(self, attrs):
+        self.attrs = attrs
+        self.id = attrs.get("Id")
+        self.names = [name.lstrip("/") for name in attrs.get("Names") or []]
+        self.labels = attrs.get("Labels") or {}
+        self.status = attrs.get("State")
+
+        # The status text looks like 'Up 2 hours (healthy)'
+        self.description = attrs.get("Status") or ""
+        match = re.search(
+            r"\((?:health: )?(healthy|unhealthy|starting)\)", self.description
+        )
+        self.health = match.group(1) if match else None
+
+        # When the container was last seen starting, if known from an event
+        self.started = None
+
+    @property
+    def name(self):
+        return self.names[0] if self.names else None
+
+    @property
+    def service(self):
+        return self.labels.get(SERVICE_LABEL)
+
+    @property
+    def uptime(self):
+        if self.status != "running":
+            return None
+
+        if self.started is not None:
+            return format_duration(time.time() - self.started)
+
+        match = re.match(r"Up (.+?)(?: \(.*\))?$", self.description)
+        return match.group(1) if match else None
+
+
+class Snapshot(object):
+    """
+    The Stack's containers, indexed by container and service name, and the
+    local images, indexed by tag.
+    """
+
+    def __init__(self, containers, images):
+        self.containers = {}
+        for container in containers:
+            self.add_container(ContainerState(container))
+
+        self.images = {}
+        for image in images:
+            for tag in image.get("RepoTags") or []:
+                if tag != "<none>:<none>":
+                    self.images[tag] = image
+
+    @classmethod
+    def take(cls, docker_client, project=None):
+        """
+        Fetches the containers of the compose project and all local images
+        :param docker_client: The Docker client
+        :param project: The compose project name, if not the default
+        :rtype: Snapshot
+        """
+        project = project or Snapshot.get_project_name()
+
+        containers = docker_client.api.containers(
+            all=True, filters={"label": "{}={}".format(PROJECT_LABEL, project)}
+        )
+        images = docker_client.api.images()
+
+        logger.debug(
+            "Snapshot: {} containers, {} images".format(len(containers), len(images))
+        )
+        return cls(containers, images)
+
+    @staticmethod
+    def get_project_name():
+        """
+        Returns the name docker-compose uses for the project, from the
+        environment, then the .env file, then the directory name
+        """
+        directory = os.path.abspath(os.getcwd())
+        name = (
+            os.environ.get("COMPOSE_PROJECT_NAME")
+            or read_env_file(os.path.join(directory, ".env")).get(
+                "COMPOSE_PROJECT_NAME"
+            )
+            or os.path.basename(directory)
+        )
+
+        return re.sub(r"[^-_a-z0-9]", "", name.lower())
+
+    def add_container(self, state):
+        for name in state.names:
+            self.containers[name] = state
+
+        # A recreated container replaces the service's old one, unless that
+        # one is still running
+        if state.service:
+            current = self.containers.get(state.service)
+            if current is None or current.status != "running":
+                self.containers[state.service] = state
+
+    def apply_event(self, event):
+        """
+        Updates the snapshot from a container event of the Docker events stream
+        :param event: The decoded event
+        :type event: dict
+        :return: The updated container state, if the event changed anything
+        :rtype: ContainerState
+        """
+        if event.get("Type") != "container":
+            return None
+
+        action = event.get("Action") or event.get("status") or ""
+        attributes = (event.get("Actor") or {}).get("Attributes") or {}
+        name = attributes.get("name")
+        if not name:
+            return None
+
+        # Add containers created since the snapshot was taken
+        state = self.containers.get(name)
+        if state is None or state.id != event.get("id"):
+            if action == "destroy":
+                return None
+
+            state = ContainerState(
+                {"Id": event.get("id"), "Names": ["/" + name], "Labels": attributes}
+            )
+            self.add_container(state)
+
+        if action.startswith("health_status"):
+            state.health = action.split(":", 1)[1].strip()
+
+        elif action == "destroy":
+            state.status = "removed"
+            state.health = None
+
+        elif action in EVENT_STATUSES:
+            state.status = EVENT_STATUSES[action]
+            if state.status == "running":
+                state.started = event.get("time") or time.time()
+            if action in ("create", "die", "stop"):
+                state.health = None
+
+        else:
+            return None
+
+        return state
+
+    def get_container(self, name):
+        """Returns the ContainerState for a container or service name, if any"""
+        return self.containers.get(name)
+
+    def has_image(self, image):
+        """Returns whether the image, e.g. 'stack/app' or 'mysql:5.7', exists"""
+        if ":" not in image.rsplit("/", 1)[-1]:
+            image = "{}:latest".format(image)
+
+        return image in self.images
@@ -0,0 +1,295 @@
+"""
+Fetching the apps' repositories for the git subtree commands. The subtree
+commands change the index and must run one at a time, so the branches of
+all apps are fetched at once beforehand, each into its own local ref, and
+the subtree commands then only read from those refs. Apps whose branch did
+not move since their subtree was last squashed from it are not fetched at
+all, and switching a subtree to another commit only changes the files that
+differ between the two.
+"""
+import os
+import re
+import shutil
+import subprocess
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+from stack import process
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# The namespace of the local refs apps are fetched into
+REF_PREFIX = "refs/stack/"
+
+# How many repositories to fetch from at once
+DEFAULT_CONCURRENCY = 8
+
+# The first version of git able to fetch without writing FETCH_HEAD
+NO_WRITE_FETCH_HEAD_VERSION = (2, 29)
+
+# The messages of the commits made when switching a subtree, as 'git subtree'
+# writes them so that it can still find them
+SQUASH_MESSAGE = """Squashed '{prefix}/' content from commit {short}
+
+git-subtree-dir: {prefix}
+git-subtree-split: {commit}
+"""
+MERGE_MESSAGE = "Merge commit '{squash}' as '{prefix}'"
+
+_git_version = None
+
+
+def get_ref(app):
+    """Returns the local ref the app's branch is fetched into"""
+    return REF_PREFIX + app
+
+
+def get_git_version():
+    """
+    Returns the version of git, only asking for it once
+    :return: The major and minor versions, or (0, 0) if unknown
+    :rtype: tuple
+    """
+    global _git_version
+    if _git_version is None:
+        try:
+            output = subprocess.check_output(
+                ["git", "--version"], stderr=subprocess.DEVNULL
+            )
+
+        except (OSError, subprocess.CalledProcessError):
+            output = b""
+
+        match = re.search(rb"(\d+)\.(\d+)", output)
+        _git_version = tuple(int(n) for n in match.groups()) if match else (0, 0)
+
+    return _git_version
+
+
+def fetch(app, url, branch):
+    """Returns the command fetching the app's branch into its local ref"""
+    command = ["git", "fetch", "--quiet", "--no-tags"]
+
+    # The fetches run at once and would all write FETCH_HEAD, which is never
+    # read, so keep them from it where git can
+    if get_git_version() >= NO_WRITE_FETCH_HEAD_VERSION:
+        command.append("--no-write-fetch-head")
+
+    return command + [url, "+{}:{}".format(branch, get_ref(app))]
+
+
+def fetch_many(repositories, concurrency=None):
+    """
+    Fetches the apps' branches concurrently, each into refs/stack/<app>
+    :param repositories: Maps each app to its repository URL and branch
+    :param concurrency: How many repositories to fetch from at once
+    :return: The apps that were fetched
+    :rtype: set
+    """
+    results = process.run_many(
+        [(app, fetch(app, url, branch)) for app, (url, branch) in repositories.items()],
+        concurrency=concurrency or DEFAULT_CONCURRENCY,
+    )
+
+    fetched = set()
+    for result in results:
+        if result.code == 0:
+            logger.debug("({}) Fetched in {:.1f}s".format(result.name, result.duration))
+            fetched.add(result.name)
+
+        else:
+            logger.error("({}) Could not fetch the repository".format(result.name))
+
+    return fetched
+
+
+def get_splits():
+    """
+    Returns the upstream commit each subtree was last squashed from, read
+    from the git-subtree trailers of the squash commits in a single pass
+    over the history
+    :return: Maps the path of each subtree ever squashed to its commit
+    :rtype: dict
+    """
+    try:
+        output = subprocess.check_output(
+            [
+                "git",
+                "log",
+                "--fixed-strings",
+                "--grep=git-subtree-dir: ",
+                "--format=%B%x00",
+                "HEAD",
+            ],
+            stderr=subprocess.DEVNULL,
+        )
+
+    except (OSError, subprocess.CalledProcessError):
+        return {}
+
+    # The newest squash of each subtree comes first
+    splits = {}
+    for message in output.decode(errors="replace").split("\0"):
+        trailers = {}
+        for line in message.splitlines():
+            key, _, value = line.partition(": ")
+            trailers[key.strip()] = value.strip()
+
+        prefix = trailers.get("git-subtree-dir", "").rstrip("/")
+        if prefix and trailers.get("git-subtree-split"):
+            splits.setdefault(prefix, trailers["git-subtree-split"])
+
+    return splits
+
+
+def get_split(prefix):
+    """
+    Returns the upstream commit the subtree at the prefix was last squashed
+    from
+    :param prefix: The path of the subtree
+    :return: The commit, if the subtree was ever squashed
+    :rtype: str
+    """
+    return get_splits().get(prefix.rstrip("/"))
+
+
+def ls_remote(url, branches):
+    """
+    Returns the commits the branches of a repository point to, in a single
+    request
+    :param url: The repository URL
+    :param branches: The branches, or tags
+    :return: Maps each branch found to its commit
+    :rtype: dict
+    """
+    output = subprocess.check_output(
+        ["git", "ls-remote", url] + sorted(branches), stderr=subprocess.DEVNULL
+    )
+    refs = {}
+    for line in output.decode().splitlines():
+        commit, _, ref = line.partition("\t")
+        refs[ref] = commit
+
+    # Prefer branches, then the commits annotated tags point to
+    heads = {}
+    for branch in branches:
+        for ref in (
+            "refs/heads/" + branch,
+            "refs/tags/{}^{{}}".format(branch),
+            "refs/tags/" + branch,
+        ):
+            if ref in refs:
+                heads[branch] = refs[ref]
+                break
+
+    return heads
+
+
+def get_remote_heads(repositories, concurrency=None):
+    """
+    Asks every repository at once which commit the apps' branches point to,
+    once per repository however many apps use it
+    :param repositories: Maps each app to its repository URL and branch
+    :param concurrency: How many repositories to ask at once
+    :return: Maps each app to the commit of its branch, or None if unknown
+    :rtype: dict
+    """
+    branches = {}
+    for url, branch in repositories.values():
+        branches.setdefault(url, set()).add(branch)
+    if not branches:
+        return {}
+
+    def get_heads(url):
+        try:
+            return ls_remote(url, branches[url])
+
+        except (OSError, subprocess.CalledProcessError):
+            logger.debug("Could not list the branches of {}".format(url))
+            return {}
+
+    urls = list(branches)
+    workers = min(concurrency or DEFAULT_CONCURRENCY, len(urls))
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        heads = dict(zip(urls, executor.map(get_heads, urls)))
+
+    return {app: heads[url].get(branch) for app, (url, branch) in repositories.items()}
+
+
+def git(*args, env=None):
+    """Runs the git command and returns its output, without the newline"""
+    output = subprocess.check_output(("git",) + args, env=env, stderr=subprocess.PIPE)
+
+    return output.decode().strip()
+
+
+def switch(prefix, commit):
+    """
+    Replaces the subtree at the prefix with the content of the commit. The
+    content is squashed into one commit, as 'git subtree add --squash'
+    does, which is merged into HEAD with the new tree computed in a
+    temporary index. HEAD is then fast-forwarded to the merge, so only the
+    files that differ are written to the working copy and the others keep
+    their modification times.
+    :param prefix: The path of the subtree
+    :param commit: The commit, or ref, to switch to
+    :return: Whether it succeeded
+    :rtype: bool
+    """
+    prefix = prefix.rstrip("/")
+    directory = tempfile.mkdtemp(prefix="stack-")
+    try:
+        commit = git("rev-parse", "--verify", "{}^{{commit}}".format(commit))
+        tree = git("rev-parse", "{}^{{tree}}".format(commit))
+
+        # Put the content in place of the subtree in a copy of the index
+        env = dict(os.environ, GIT_INDEX_FILE=os.path.join(directory, "index"))
+        git("read-tree", "HEAD", env=env)
+        git("rm", "-r", "--cached", "--quiet", "--ignore-unmatch", prefix, env=env)
+        git("read-tree", "--prefix={}/".format(prefix), tree, env=env)
+        stack_tree = git("write-tree", env=env)
+
+        if (
+            stack_tree == git("rev-parse", "HEAD^{tree}")
+            and get_split(prefix) == commit
+        ):
+            logger.info("({}) Already at {}".format(prefix, commit[:7]))
+            return True
+
+        # Commit it as a squash merge and move to it
+        squash = git(
+            "commit-tree",
+            tree,
+            "-m",
+            SQUASH_MESSAGE.format(prefix=prefix, short=commit[:7], commit=commit),
+        )
+        merge = git(
+            "commit-tree",
+            stack_tree,
+            "-p",
+            "HEAD",
+            "-p",
+            squash,
+            "-m",
+            MERGE_MESSAGE.format(squash=squash, prefix=prefix),
+        )
+        git("merge", "--ff-only", "--quiet", merge)
+
+    except subprocess.CalledProcessError as e:
+        logger.error(
+            "({}) Could not switch the subtree to {}: {}".format(
+                prefix, commit, e.stderr.decode(errors="replace").strip()
+            )
+        )
+        return False
+
+    except OSError as e:
+        logger.error("({}) Could not run git: {}".format(prefix, e))
+        return False
+
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+
+    return True
@@ -0,0 +1,235 @@
+"""
+Uploading distributions to the package index over one keep-alive session.
+The index is asked once which files of a project it already has, so only
+new distributions are sent, and they are streamed from disk rather than read
+into memory.
+"""
+import os
+import posixpath
+import re
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import unquote, urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from stack.fingerprint import hash_file
+
+import logging
+
+logger = logging.getLogger("stack")
+
+# How many files to upload at once
+DEFAULT_CONCURRENCY = 4
+
+# How many bytes of a file to send at a time
+CHUNK_SIZE = 64 * 1024
+
+# The extensions of distributions and their file types
+DIST_TYPES = ((".whl", "bdist_wheel"), (".tar.gz", "sdist"), (".zip", "sdist"))
+
+# The links of a simple index page
+HREF = re.compile(r"""href=["']([^"']+)["']""", re.IGNORECASE)
+
+
+def normalize(name):
+    """Returns the project name as it appears in the index's URLs"""
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def parse_filename(filename):
+    """
+    Returns the metadata of a distribution needed to upload it
+    :param filename: The distribution's file name
+    :return: The project name, version, file type and Python version, or
+     None if it is not a distribution
+    :rtype: tuple
+    """
+    for extension, filetype in DIST_TYPES:
+        if not filename.endswith(extension):
+            continue
+
+        stem = filename[: -len(extension)]
+        if filetype == "bdist_wheel":
+            parts = stem.split("-")
+            if len(parts) < 5:
+                return None
+
+            return parts[0], parts[1], filetype, parts[-3]
+
+        name, _, version = stem.rpartition("-")
+        if not name:
+            return None
+
+        return name, version, filetype, "source"
+
+    return None
+
+
+class MultipartBody(object):
+    """
+    A multipart/form-data body whose file is read from disk as it is sent.
+    Its length is known beforehand, so it is sent with a Content-Length.
+    """
+
+    def __init__(self, fields, name, path):
+        self.path = path
+        self.boundary = uuid.uuid4().hex
+
+        parts = []
+        for key, value in fields:
+            parts.append(
+                '--{}\r\nContent-Disposition: form-data; name="{}"\r\n\r\n'
+                "{}\r\n".format(self.boundary, key, value)
+            )
+        parts.append(
+            '--{}\r\nContent-Disposition: form-data; name="{}"; filename="{}"\r\n'
+            "Content-Type: application/octet-stream\r\n\r\n".format(
+                self.boundary, name, os.path.basename(path)
+            )
+        )
+        self.head = "".join(parts).encode()
+        self.tail = "\r\n--{}--\r\n".format(self.boundary).encode()
+        self.size = os.path.getsize(path)
+
+    @property
+    def content_type(self):
+        return "multipart/form-data; boundary={}".format(self.boundary)
+
+    def __len__(self):
+        return len(self.head) + self.size + len(self.tail)
+
+    def __iter__(self):
+        yield self.head
+        with open(self.path, "rb") as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b""):
+                yield chunk
+        yield self.tail
+
+
+class Uploader(object):
+    """Uploads distributions to an index, safe to use from several threads"""
+
+    def __init__(self, index_url, username, password, concurrency=None, jobs=None):
+        self.index_url = index_url.rstrip("/") + "/"
+        self.concurrency = concurrency or DEFAULT_CONCURRENCY
+        self.pool_size = self.concurrency * (jobs or 1)
+
+        # Keep a connection open for each upload running at once, from each of
+        # the jobs calling upload at the same time
+        self.session = requests.Session()
+        self.session.auth = (username, password)
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=self.pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def get_existing(self, project):
+        """
+        Returns the file names the index has for the project
+        :param project: The project name
+        :rtype: set
+        """
+        response = self.session.get(
+            "{}+simple/{}/".format(self.index_url, normalize(project))
+        )
+        if response.status_code == 404:
+            return set()
+
+        response.raise_for_status()
+
+        return set(
+            unquote(posixpath.basename(urlparse(href).path))
+            for href in HREF.findall(response.text)
+        )
+
+    def upload(self, paths, prefix=None):
+        """
+        Uploads the distributions the index does not have yet, at once
+        :param paths: The paths of the distributions
+        :param prefix: A prefix to add to every logged line
+        :return: Whether every distribution is on the index
+        :rtype: bool
+        """
+        prefix = prefix or ""
+        dists = {}
+        for path in paths:
+            metadata = parse_filename(os.path.basename(path))
+            if metadata is None:
+                logger.debug("{}Not a distribution: {}".format(prefix, path))
+                continue
+
+            dists[path] = metadata
+
+        # Ask for each project's files only once
+        existing = set()
+        for project in set(normalize(metadata[0]) for metadata in dists.values()):
+            try:
+                existing.update(self.get_existing(project))
+
+            except requests.RequestException as e:
+                logger.error("{}Could not query the index: {}".format(prefix, e))
+                return False
+
+        missing = [path for path in dists if os.path.basename(path) not in existing]
+        logger.info(
+            "{}Uploading {} of {} distributions".format(
+                prefix, len(missing), len(dists)
+            )
+        )
+        if not missing:
+            return True
+
+        workers = min(self.concurrency, len(missing))
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            results = list(
+                executor.map(
+                    lambda path: self.upload_file(path, dists[path], prefix), missing
+                )
+            )
+
+        return all(results)
+
+    def upload_file(self, path, metadata, prefix=""):
+        """
+        Uploads a distribution
+        :param path: The path of the distribution
+        :param metadata: The distribution's metadata from parse_filename
+        :param prefix: A prefix to add to every logged line
+        :return: Whether it succeeded
+        :rtype: bool
+        """
+        name, version, filetype, pyversion = metadata
+        fields = [
+            (":action", "file_upload"),
+            ("protocol_version", "1"),
+            ("name", name),
+            ("version", version),
+            ("filetype", filetype),
+            ("pyversion", pyversion),
+            ("sha256_digest", hash_file(path)),
+        ]
+        body = MultipartBody(fields, "content", path)
+        filename = os.path.basename(path)
+
+        try:
+            response = self.session.post(
+                self.index_url, data=body, headers={"Content-Type": body.content_type}
+            )
+
+            # Another upload got there first
+            if response.status_code == 409:
+                logger.info("{}Already uploaded {}".format(prefix, filename))
+                return True
+
+            response.raise_for_status()
+
+        except requests.RequestException as e:
+            logger.error("{}Could not upload {}: {}".format(prefix, filename, e))
+            return False
+
+        logger.info("{}Uploaded {}".format(prefix, filename))
+        return True
+
+    def close(self):
+        self.session.close()
@@ -0,0 +1,88 @@
+"""Fixtures shared by the tests running commands against a fake stack."""
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from stack import client
+from stack.config import StackConfig
+
+
+class FakeAPI(object):
+    """
+    A Docker API whose containers are all running and run commands by
+    replaying their output
+    :param outputs: Maps each container to the (stdout, stderr) chunks its
+     commands write and their exit code
+    """
+
+    def __init__(self, outputs):
+        self.outputs = outputs
+        self.execs = []
+        self.archives = {}
+
+    def containers(self, all=False, filters=None):
+        self.filters = filters
+        return [
+            {"Id": name, "Names": ["/" + name], "State": "running"}
+            for name in self.outputs
+        ]
+
+    def images(self):
+        return []
+
+    def exec_create(self, container, cmd):
+        if container not in self.outputs:
+            from docker import errors
+
+            raise errors.NotFound(container)
+
+        self.execs.append((container, cmd))
+        return {"Id": container}
+
+    def exec_start(self, exec_id, stream=False, demux=False):
+        return iter(self.outputs[exec_id][0])
+
+    def exec_inspect(self, exec_id):
+        return {"ExitCode": self.outputs[exec_id][1]}
+
+    def put_archive(self, container, path, data):
+        self.archives[container] = (path, b"".join(data))
+        return True
+
+
+class FakeClient(object):
+    def __init__(self, outputs):
+        self.api = FakeAPI(outputs)
+
+
+class StackTestCase(TestCase):
+    """
+    Runs each test in a new stack directory holding the compose and stack
+    files, with the containers of the outputs behind a fake Docker client
+    """
+
+    compose = "services: {}\n"
+    stack = "stack:\n  name: test\n"
+    outputs = None
+
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        os.chdir(self.root)
+        self.write("docker-compose.yml", self.compose)
+        self.write("stack.yml", self.stack)
+        StackConfig.invalidate()
+        if self.outputs is not None:
+            client._client = FakeClient(self.outputs)
+
+    def tearDown(self):
+        client._client = None
+        os.chdir(self.cwd)
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        with open(path, "w") as f:
+            f.write(content)
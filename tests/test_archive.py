@@ -0,0 +1,82 @@
+"""Tests for the local log archive."""
+
+
+import gzip
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from stack import archive
+
+
+def line(seconds, message):
+    return archive.format_key(seconds) + b"Z " + message
+
+
+class TestLogArchive(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_keys(self):
+        key = archive.format_key(1700000000.25)
+        self.assertEqual(key, b"2023-11-14T22:13:20.250000000")
+        self.assertEqual(archive.parse_key(key), 1700000000.25)
+
+    def test_read(self):
+        logs = archive.LogArchive.for_app(self.root, "app")
+        for i in range(30):
+            logs.append(line(1000 + i, b"message %d" % i))
+            if i % 10 == 9:
+                logs.flush()
+
+        # Each flush is indexed as its own member
+        segment = logs.get_segments()[0]
+        entries = logs.read_index(segment)
+        self.assertEqual([entry["lines"] for entry in entries], [10, 10, 10])
+        with open(segment, "rb") as f:
+            f.seek(entries[1]["offset"])
+            member = gzip.decompress(f.read(entries[1]["length"]))
+            self.assertTrue(member.startswith(line(1010, b"message 10")))
+
+        self.assertEqual(len(list(logs.read())), 30)
+        self.assertEqual(
+            list(logs.read(since=1025)),
+            [line(1000 + i, b"message %d" % i) for i in range(25, 30)],
+        )
+
+    def test_resume(self):
+        logs = archive.LogArchive.for_app(self.root, "app")
+        logs.append(line(1000, b"first"))
+        logs.append(line(1001, b"second"))
+        logs.flush()
+
+        # Following again from the last line archived skips what is kept
+        logs = archive.LogArchive.for_app(self.root, "app")
+        self.assertEqual(logs.get_since(), 1001)
+        logs.append(line(1001, b"second"))
+        logs.append(line(1002, b"third"))
+        logs.flush()
+
+        self.assertEqual(
+            [message.split(b" ", 1)[1] for message in logs.read()],
+            [b"first", b"second", b"third"],
+        )
+        self.assertTrue(os.path.isdir(os.path.join(self.root, ".stack", "logs", "app")))
+
+    def test_segments(self):
+        size, archive.SEGMENT_SIZE = archive.SEGMENT_SIZE, 1
+        try:
+            logs = archive.LogArchive.for_app(self.root, "app")
+            for i in range(3):
+                logs.append(line(1000 + i, b"message"))
+                logs.flush()
+
+        finally:
+            archive.SEGMENT_SIZE = size
+
+        self.assertEqual(len(logs.get_segments()), 3)
+        self.assertEqual(len(list(logs.read(since=1001))), 2)
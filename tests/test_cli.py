@@ -35,3 +35,13 @@ class TestVersion(TestCase):
         )
         output = process.stdout
         self.assertEqual(output.strip(), __version__)
+
+
+class TestUsage(TestCase):
+    def test_app_is_single(self):
+        # Repeating <app> in any command would turn it into a list in all of them
+        from docopt import docopt
+        from stack import cli
+
+        self.assertEqual(docopt(cli.__doc__, ["status", "app"])["<app>"], "app")
+        self.assertEqual(docopt(cli.__doc__, ["wait", "a", "b"])["<apps>"], ["a", "b"])
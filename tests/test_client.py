@@ -0,0 +1,99 @@
+"""Tests for the shared Docker client."""
+
+
+import json
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler
+from unittest import TestCase
+
+from stack import client
+
+
+class FakeDockerHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def address_string(self):
+        return "fake"
+
+    def log_message(self, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.connections += 1
+
+    def do_GET(self):
+        self.server.paths.append(self.path)
+        if self.path.endswith("/version"):
+            body = {"ApiVersion": "1.41", "Version": "20.10.0"}
+        else:
+            body = {"Id": "abc", "State": {"Status": "running", "Running": True}}
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class FakeDocker(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def __init__(self, path):
+        super().__init__(path, FakeDockerHandler)
+        self.paths = []
+        self.connections = 0
+
+
+class TestDockerClient(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.server = FakeDocker(os.path.join(self.directory, "docker.sock"))
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+        self.environ = dict(os.environ)
+        os.environ["DOCKER_HOST"] = "unix://" + self.server.server_address
+        for name in ("DOCKER_API_VERSION", "STACK_DOCKER_TIMEOUT"):
+            os.environ.pop(name, None)
+        client.reset()
+
+    def tearDown(self):
+        client.reset()
+        os.environ.clear()
+        os.environ.update(self.environ)
+        self.server.shutdown()
+        self.server.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_shared(self):
+        docker_client = client.get_docker_client()
+        self.assertIs(client.get_docker_client(), docker_client)
+
+        # The pinned version means the daemon is never asked for its own
+        self.assertEqual(docker_client.api.api_version, client.DEFAULT_API_VERSION)
+        for name in ("app", "db", "app", "db"):
+            docker_client.api.inspect_container(name)
+        self.assertEqual(
+            self.server.paths,
+            ["/v1.41/containers/app/json", "/v1.41/containers/db/json"] * 2,
+        )
+
+        # Connections are kept open and reused
+        self.assertEqual(self.server.connections, 2)
+
+    def test_settings(self):
+        config = {"version": "auto", "timeout": 10, "pool-size": 4}
+        self.assertEqual(client.get_settings(config), ("auto", 10, 4))
+
+        os.environ["STACK_DOCKER_TIMEOUT"] = "5"
+        self.assertEqual(client.get_settings(config), ("auto", 5, 4))
+
+        # Negotiating asks the daemon for its version first
+        docker_client = client.get_docker_client(config)
+        self.assertEqual(docker_client.api.timeout, 5)
+        self.assertEqual(self.server.paths, ["/version"])
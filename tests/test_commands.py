@@ -0,0 +1,30 @@
+"""Tests for the command dispatch table."""
+
+
+from unittest import TestCase
+
+from stack import commands
+from stack.commands.base import Base
+
+
+class TestRegistry(TestCase):
+    def test_all_commands_register(self):
+        for name in commands.MODULES:
+            command = commands.get_command(name)
+            self.assertEqual(command.name, name)
+            self.assertTrue(issubclass(command.cls, Base))
+
+    def test_metadata(self):
+        self.assertTrue(commands.get_command("status").docker)
+        self.assertFalse(commands.get_command("status").git)
+        self.assertTrue(commands.get_command("checkout").git)
+        self.assertFalse(commands.get_command("logs").docker)
+
+    def test_find_command(self):
+        options = {"up": True, "down": False, "<app>": "down", "--clean": True}
+        self.assertEqual(commands.find_command(options).name, "up")
+        self.assertIsNone(commands.find_command({"up": False, "--version": True}))
+
+    def test_ambiguous_command(self):
+        with self.assertRaises(ValueError):
+            commands.find_command({"up": True, "down": True})
@@ -0,0 +1,100 @@
+"""Tests for the cached configuration model."""
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from stack.config import StackConfig
+
+COMPOSE = """
+version: '2.1'
+services:
+  app:
+    container_name: app-stack
+    build:
+      context: ./overrides/app
+    image: stack/app
+    labels:
+      repository: https://example.com/app.git
+    depends_on:
+      stackdb:
+        condition: service_healthy
+  stackdb:
+    image: mysql:5.7
+"""
+
+STACK = """
+stack:
+  name: test
+  apps-directory: apps
+  apps:
+    app:
+      branch: development
+"""
+
+
+class TestStackConfig(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.write("docker-compose.yml", COMPOSE)
+        self.write("stack.yml", STACK)
+        StackConfig.invalidate()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content):
+        with open(os.path.join(self.root, name), "w") as f:
+            f.write(content)
+
+    def test_model(self):
+        config = StackConfig.load(self.root)
+        self.assertEqual(config.apps, ["app", "stackdb"])
+        self.assertEqual(config.get("name"), "test")
+        self.assertEqual(config.get_app_config("app", "branch"), "development")
+
+        app = config.get_service("app")
+        self.assertEqual(app.build_dir, "./overrides/app")
+        self.assertEqual(app.container_name, "app-stack")
+        self.assertEqual(app.depends_on, ["stackdb"])
+        self.assertEqual(app.labels["repository"], "https://example.com/app.git")
+        self.assertIsNone(config.get_service("stackdb").build_dir)
+
+    def test_parsed_once(self):
+        count = StackConfig.parse_count
+        config = StackConfig.load(self.root)
+        for _ in range(10):
+            self.assertIs(StackConfig.load(self.root), config)
+
+        self.assertEqual(StackConfig.parse_count, count + 2)
+
+    def test_invalidated_by_change(self):
+        config = StackConfig.load(self.root)
+        self.write("stack.yml", STACK.replace("name: test", "name: changed"))
+        os.utime(os.path.join(self.root, "stack.yml"), (0, 0))
+
+        reloaded = StackConfig.load(self.root)
+        self.assertIsNot(reloaded, config)
+        self.assertEqual(reloaded.get("name"), "changed")
+
+    def test_snapshot(self):
+        config = StackConfig.load(self.root)
+        self.assertTrue(os.listdir(os.path.join(self.root, ".stack", "cache")))
+
+        # A fresh process should load the snapshot without parsing any YAML
+        StackConfig.invalidate()
+        count = StackConfig.parse_count
+        snapshot = StackConfig.load(self.root)
+        self.assertEqual(StackConfig.parse_count, count)
+        self.assertEqual(snapshot.apps, config.apps)
+        self.assertEqual(snapshot.get("name"), "test")
+
+        # Changing either file's contents invalidates the snapshot
+        StackConfig.invalidate()
+        self.write("docker-compose.yml", COMPOSE + "  mail:\n    image: mailhog\n")
+        self.assertIn("mail", StackConfig.load(self.root).apps)
+        self.assertEqual(StackConfig.parse_count, count + 2)
+        cache = os.path.join(self.root, ".stack", "cache")
+        self.assertEqual(len(os.listdir(cache)), 1)
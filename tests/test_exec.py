@@ -0,0 +1,49 @@
+"""Tests for running commands in several containers at once."""
+
+
+from stack import client
+from stack.app import App
+from support import StackTestCase
+
+COMPOSE = """
+services:
+  app:
+    container_name: app-stack
+    image: app
+  db:
+    container_name: db-stack
+    image: db
+"""
+
+
+class TestExecMany(StackTestCase):
+    compose = COMPOSE
+    outputs = {
+        "app-stack": ([(b"migrating\nd", None), (b"one\n", b"warn")], 0),
+        "db-stack": ([(None, b"failed\n")], 2),
+    }
+
+    def test_exec_many(self):
+        with self.assertLogs("stack", "INFO") as logs:
+            results = App.exec_many(["app", "db", "mail"], ["manage.py", "migrate"])
+
+        self.assertEqual([r.code for r in results], [0, 2, None])
+        self.assertEqual(
+            sorted(client._client.api.execs),
+            [
+                ("app-stack", ["manage.py", "migrate"]),
+                ("db-stack", ["manage.py", "migrate"]),
+            ],
+        )
+
+        # Output is split into lines per stream, even across chunks
+        stdout = "\n".join(o for o in logs.output if o.startswith("INFO"))
+        stderr = "\n".join(o for o in logs.output if o.startswith("ERROR"))
+        self.assertIn("migrating", stdout)
+        self.assertIn("done", stdout)
+        self.assertIn("warn", stderr)
+        self.assertIn("failed", stderr)
+
+        # The summary ends the output
+        self.assertIn("Exit code", logs.output[-4])
+        self.assertTrue(logs.output[-1].endswith("not run"))
@@ -0,0 +1,83 @@
+"""Tests for fingerprinting build contexts."""
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from stack.fingerprint import DockerIgnore, Manifest, fingerprint_tree
+
+
+class TestDockerIgnore(TestCase):
+    def test_patterns(self):
+        ignore = DockerIgnore(
+            ["# comment", "*.pyc", "node_modules", "docs/*", "!docs/keep.md"]
+        )
+        self.assertTrue(ignore.ignored("module.pyc"))
+        self.assertTrue(ignore.ignored("node_modules/package/index.js"))
+        self.assertTrue(ignore.ignored("docs/other.md"))
+        self.assertFalse(ignore.ignored("docs/keep.md"))
+        self.assertFalse(ignore.ignored("app/module.py"))
+        self.assertTrue(ignore.has_exceptions)
+
+    def test_nested(self):
+        # Wildcards stay within a segment, as in Docker, except for '**'
+        ignore = DockerIgnore(["*.md", "docs/*.txt", "**/*.log", "build/**"])
+        self.assertTrue(ignore.ignored("README.md"))
+        self.assertFalse(ignore.ignored("docs/x.md"))
+        self.assertTrue(ignore.ignored("docs/x.txt"))
+        self.assertFalse(ignore.ignored("docs/api/x.txt"))
+        self.assertTrue(ignore.ignored("app.log"))
+        self.assertTrue(ignore.ignored("app/logs/today.log"))
+        self.assertTrue(ignore.ignored("build/lib/module.py"))
+
+
+class TestFingerprint(TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.write("Dockerfile", "FROM python:3")
+        self.write("app/module.py", "print('hello')")
+        self.write("app/cache.pyc", "compiled")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, name, content, mtime=None):
+        path = os.path.join(self.root, name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+        if mtime is not None:
+            os.utime(path, ns=(mtime, mtime))
+
+    def test_fingerprint(self):
+        ignore = DockerIgnore(["*.pyc", "**/*.pyc"])
+        fingerprint, files = fingerprint_tree(self.root, ignore)
+        self.assertEqual(sorted(files), ["Dockerfile", "app/module.py"])
+
+        # Ignored files and unchanged files don't matter
+        self.write("app/cache.pyc", "recompiled")
+        self.assertEqual(fingerprint_tree(self.root, ignore, files)[0], fingerprint)
+
+        # Extra inputs and changed files do
+        self.assertNotEqual(
+            fingerprint_tree(self.root, ignore, files, {"args": {"A": "1"}})[0],
+            fingerprint,
+        )
+        self.write("app/module.py", "print('world')")
+        self.assertNotEqual(fingerprint_tree(self.root, ignore, files)[0], fingerprint)
+
+    def test_stat_fast_path(self):
+        self.write("app/module.py", "print('hello')", mtime=10**9)
+        fingerprint, files = fingerprint_tree(self.root)
+
+        # Same size and modification time, so the file is not hashed again
+        self.write("app/module.py", "print('HELLO')", mtime=10**9)
+        self.assertEqual(fingerprint_tree(self.root, previous=files)[0], fingerprint)
+        self.assertNotEqual(fingerprint_tree(self.root)[0], fingerprint)
+
+    def test_manifest(self):
+        path = os.path.join(self.root, ".stack", "builds.json")
+        Manifest.load(path).set("app", {"fingerprint": "abc"})
+        self.assertEqual(Manifest(path).get("app"), {"fingerprint": "abc"})
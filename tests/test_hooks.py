@@ -0,0 +1,126 @@
+"""Tests for finding and running hooks."""
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase
+
+from stack import hooks
+from stack.app import Stack
+from support import StackTestCase
+
+# A hook that does its work when executed
+SCRIPT = """
+import sys
+raise RuntimeError("executed")
+"""
+
+# A hook that can be called in-process
+ENTRY_POINT = """
+import sys
+
+CALLS = []
+
+
+def run(app, *args):
+    CALLS.append((app,) + args)
+    return 3 if args else None
+
+
+if __name__ == "__main__":
+    sys.exit(run(*sys.argv[1:]))
+"""
+
+STACK = """
+stack:
+  name: test
+  in-process-hooks: true
+  hooks:
+    post-clone:
+      inputs:
+        - apps/{app}/package.json
+"""
+
+
+class TestHookIndex(TestCase):
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.write("pre-build.py", ENTRY_POINT)
+        self.write("post-build.py", SCRIPT)
+        self.write("README.md", "")
+        hooks.HookIndex.invalidate()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def write(self, name, content):
+        with open(os.path.join(self.directory, name), "w") as f:
+            f.write(content)
+
+    def test_index(self):
+        index = hooks.HookIndex.load(self.directory)
+        self.assertIs(hooks.HookIndex.load(self.directory), index)
+        self.assertEqual(sorted(index.scripts), ["post-build", "pre-build"])
+
+        # Scripts added later are not looked for again
+        self.write("pre-up.py", ENTRY_POINT)
+        self.assertIsNone(index.get("pre-up"))
+
+    def test_entry_point(self):
+        index = hooks.HookIndex.load(self.directory)
+        run = index.get_entry_point("pre-build")
+        self.assertIs(index.get_entry_point("pre-build"), run)
+
+        self.assertEqual(hooks.call("pre-build", run, ["app"]), 0)
+        self.assertEqual(hooks.call("pre-build", run, ["app", "repo"]), 3)
+        self.assertEqual(run.__globals__["CALLS"], [("app",), ("app", "repo")])
+
+    def test_script(self):
+        # Scripts without a run() function are never imported
+        index = hooks.HookIndex.load(self.directory)
+        self.assertIsNone(index.get_entry_point("post-build"))
+        self.assertIsNone(index.get_entry_point("pre-up"))
+
+    def test_failure(self):
+        def run(app):
+            raise ValueError(app)
+
+        with self.assertLogs("stack", "ERROR"):
+            self.assertEqual(hooks.call("pre-build", run, ["app"]), 1)
+
+
+class TestHookInputs(StackTestCase):
+    compose = "services:\n  app:\n    image: app\n"
+    stack = STACK
+
+    def setUp(self):
+        super().setUp()
+        os.makedirs("hooks")
+        os.makedirs(os.path.join("apps", "app"))
+        self.write(os.path.join("hooks", "post-clone.py"), ENTRY_POINT)
+        self.write(os.path.join("apps", "app", "package.json"), "{}")
+        hooks.HookIndex.invalidate()
+
+    def calls(self):
+        index = hooks.HookIndex.load(os.path.join(self.root, "hooks"))
+        return index.get_entry_point("post-clone").__globals__["CALLS"]
+
+    def test_skipped(self):
+        self.assertEqual(Stack.hook("post-clone", "app"), 0)
+        with self.assertLogs("stack", "INFO") as logs:
+            self.assertEqual(Stack.hook("post-clone", "app"), 0)
+        self.assertIn("unchanged, skipping", logs.output[0])
+        self.assertEqual(len(self.calls()), 1)
+
+        # Changing an input, or the arguments, runs it again
+        self.write(os.path.join("apps", "app", "package.json"), '{"a": 1}')
+        Stack.hook("post-clone", "app")
+        Stack.hook("post-clone", "app", ["other"])
+        self.assertEqual(len(self.calls()), 3)
+
+    def test_failed(self):
+        # Failures are not recorded, so the hook runs again
+        Stack.hook("post-clone", "app", ["fail"])
+        Stack.hook("post-clone", "app", ["fail"])
+        self.assertEqual(len(self.calls()), 2)
@@ -0,0 +1,60 @@
+"""Import-time regressions for the CLI."""
+
+
+import subprocess
+import sys
+from unittest import TestCase
+
+# Libraries that only some commands need and that are slow to import
+HEAVY = ("boto3", "botocore", "docker", "mysql")
+
+
+def imported_modules(statement):
+    """Returns the modules imported by the statement, via -X importtime"""
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", statement],
+        check=True,
+        stderr=subprocess.PIPE,
+        universal_newlines=True,
+    )
+
+    # Lines look like: 'import time:   123 |   456 |   package.module'
+    modules = set()
+    for line in process.stderr.splitlines():
+        if line.startswith("import time:") and "|" in line:
+            modules.add(line.rsplit("|", 1)[1].strip())
+
+    return modules
+
+
+class TestLazyImports(TestCase):
+    def assertNotHeavy(self, modules):
+        for module in modules:
+            self.assertFalse(
+                module.split(".")[0] in HEAVY, "{} was imported".format(module)
+            )
+
+    def test_cli(self):
+        modules = imported_modules("import stack.cli")
+        self.assertIn("stack.cli", modules)
+        self.assertNotHeavy(modules)
+
+    def test_logs_command(self):
+        modules = imported_modules("import stack.cli, stack.commands.logs")
+        self.assertIn("stack.commands.logs", modules)
+        self.assertNotIn("stack.commands.secrets", modules)
+        self.assertNotHeavy(modules)
+
+    def test_secrets_command(self):
+        modules = imported_modules("import stack.commands.secrets")
+        self.assertNotIn("boto3", modules)
+
+    def test_registry(self):
+        # Commands in the registry are only imported when requested
+        modules = imported_modules(
+            "import sys; from stack import commands;"
+            "commands.get_command('logs');"
+            "assert 'stack.commands.logs' in sys.modules;"
+            "assert 'stack.commands.secrets' not in sys.modules"
+        )
+        self.assertNotHeavy(modules)
@@ -0,0 +1,258 @@
+"""Tests for searching and following container logs."""
+
+
+import time
+from unittest import TestCase, mock
+
+from requests.exceptions import ConnectionError
+
+from stack import logs
+from stack.app import App, Stack
+from stack.commands.logs import Logs
+
+
+class FakeStream(object):
+    def __init__(self, chunks):
+        self.chunks = iter(chunks)
+        self.read = 0
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        self.read += 1
+        return next(self.chunks)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeContainer(object):
+    def __init__(self, lines, chunk_size=7, written=0):
+        self.lines = list(lines)
+        self.chunk_size = chunk_size
+        self.written = written
+        self.tails = []
+        self.untils = []
+
+    @property
+    def output(self):
+        return b"".join(line + b"\n" for line in self.lines)
+
+    def logs(
+        self,
+        stream=False,
+        follow=False,
+        timestamps=False,
+        since=None,
+        until=None,
+        tail="all",
+    ):
+        if stream:
+            self.stream = FakeStream(
+                self.output[i : i + self.chunk_size]
+                for i in range(0, len(self.output), self.chunk_size)
+            )
+            return self.stream
+
+        self.tails.append(tail)
+        self.untils.append(until)
+
+        # Line i was written at 1 second and a half past i seconds
+        lines = [
+            (i + 1.5, time.strftime("%Y-%m-%dT%H:%M:%S.5Z ", time.gmtime(i + 1)))
+            for i in range(len(self.lines))
+        ]
+        lines = [
+            stamp.encode() + line
+            for (written, stamp), line in zip(lines, self.lines)
+            if until is None or written <= until
+        ]
+        if tail != "all":
+            lines = lines[-tail:]
+
+        # Keep writing between requests
+        self.lines.extend(b"written %d" % i for i in range(self.written))
+
+        return b"".join(line + b"\n" for line in lines)
+
+
+class TestSearch(TestCase):
+    def setUp(self):
+        lines = [b"line %d" % i for i in range(100)]
+        lines[10] = b"Listening at http://localhost:8000/first"
+        lines[90] = b"Listening at http://localhost:8000/last"
+        self.container = FakeContainer(lines)
+
+    def test_first(self):
+        match = logs.search(self.container, r"Listening at (\S+)")
+        self.assertEqual(match.group(1), b"http://localhost:8000/first")
+
+        # It stopped reading at the match and closed the stream
+        self.assertTrue(self.container.stream.closed)
+        self.assertLess(self.container.stream.read, 100)
+
+    def test_scan(self):
+        # Lines split across chunks are matched whole
+        matches = list(logs.scan(self.container, "^line 9[0-9]$"))
+        self.assertEqual(
+            [m.string for m in matches], [b"line %d" % i for i in range(91, 100)]
+        )
+
+    def test_latest(self):
+        match = logs.search(self.container, r"Listening at (\S+)", latest=True)
+        self.assertEqual(match.group(1), b"http://localhost:8000/last")
+
+        match = logs.search_backwards(self.container, "/first", window=4)
+        self.assertEqual(match.string, b"Listening at http://localhost:8000/first")
+        self.assertEqual(self.container.tails, [1000, 4, 8, 16, 32, 64, 128])
+
+    def test_written_meanwhile(self):
+        # Lines written between requests do not shift the windows
+        lines = [b"line %d" % i for i in range(100)]
+        lines[70] = b"Listening at http://localhost:8000/last"
+        container = FakeContainer(lines, written=10)
+
+        match = logs.search_backwards(container, "Listening", window=4)
+        self.assertEqual(match.string, b"Listening at http://localhost:8000/last")
+        self.assertEqual(container.untils, [None] + [100.5] * 3)
+
+    def test_timestamp(self):
+        self.assertEqual(logs.get_timestamp(b"1970-01-01T00:01:40Z line"), 100)
+        self.assertEqual(
+            logs.get_timestamp(b"1970-01-01T00:01:40.1234561Z line"), 100.123457
+        )
+
+    def test_not_found(self):
+        self.assertIsNone(logs.search(self.container, "missing"))
+        self.assertIsNone(logs.search(self.container, "missing", latest=True))
+
+        # The tail limits how far back to search
+        self.assertIsNone(logs.search(self.container, "/first", tail=50, latest=True))
+        self.assertEqual(self.container.tails[-1], 50)
+
+
+class FollowedContainer(object):
+    def __init__(self, chunks, delay=0):
+        self.chunks = chunks
+        self.delay = delay
+
+    def logs(self, **kwargs):
+        self.kwargs = kwargs
+        return FakeStream(self.generate())
+
+    def generate(self):
+        time.sleep(self.delay)
+        for chunk in self.chunks:
+            yield chunk
+
+
+class TestLogMerger(TestCase):
+    def test_sort_key(self):
+        self.assertLess(
+            logs.get_sort_key(b"2024-01-01T00:00:00.1Z a"),
+            logs.get_sort_key(b"2024-01-01T00:00:00.12Z b"),
+        )
+        self.assertLess(
+            logs.get_sort_key(b"2024-01-01T00:00:00Z a"),
+            logs.get_sort_key(b"2024-01-01T00:00:00.000000001Z b"),
+        )
+
+    def test_merged(self):
+        # The second container's earlier lines arrive later, within the window
+        containers = {
+            "app": FollowedContainer(
+                [b"2024-01-01T00:00:01.5Z app 1\n2024-01-01T00:00:03Z app 2\n"]
+            ),
+            "db": FollowedContainer(
+                [b"2024-01-01T00:00:01Z db 1\n2024-01-01T00:00:0", b"2Z db 2\n"],
+                delay=0.05,
+            ),
+        }
+        merger = logs.LogMerger(window=0.5)
+        merger.start(containers, tail=10)
+        lines = [line for batch in merger.batches() for line in batch]
+
+        self.assertEqual(
+            [line.split(b" ", 1)[1] for _, line in lines],
+            [b"db 1", b"app 1", b"db 2", b"app 2"],
+        )
+        self.assertEqual([app for app, _ in lines], ["db", "app", "db", "app"])
+        self.assertTrue(containers["app"].kwargs["timestamps"])
+        self.assertEqual(containers["app"].kwargs["tail"], 10)
+
+    def test_ring_buffer(self):
+        chunks = [b"2024-01-01T00:00:0%dZ line\n" % i for i in range(5)]
+        merger = logs.LogMerger(buffer_size=2)
+        merger.start({"app": FollowedContainer(chunks)})
+        while merger.running:
+            time.sleep(0.01)
+
+        with self.assertLogs("stack", "WARNING") as logged:
+            lines = [line for batch in merger.batches() for _, line in batch]
+        self.assertEqual(lines, [chunk[:-1] for chunk in chunks[-2:]])
+        self.assertIn("skipped 3 lines", logged.output[0])
+
+
+class FakeContainers(object):
+    def __init__(self, containers):
+        self.containers = containers
+
+    def get(self, name):
+        if self.containers is None:
+            raise ConnectionError("Connection refused")
+
+        return self.containers[name]
+
+
+class FakeClient(object):
+    def __init__(self, containers):
+        self.containers = FakeContainers(containers)
+
+
+class TestLogsCommand(TestCase):
+    def run_logs(self, lines, follow=True):
+        options = {
+            "<apps>": ["app"],
+            "--archive": False,
+            "--grep": None,
+            "--latest": False,
+            "--follow": follow,
+            "--minutes": None,
+            "--lines": lines,
+        }
+        container = FollowedContainer([b"2024-01-01T00:00:01Z app 1\n"])
+        with mock.patch.object(
+            Stack, "get_docker_client", return_value=FakeClient({"app": container})
+        ), mock.patch.object(App, "get_container_name", return_value=None):
+            Logs(options).run()
+
+        return container
+
+    def test_follow_tail(self):
+        with mock.patch("sys.stdout"):
+            self.assertEqual(self.run_logs("10").kwargs["tail"], 10)
+            self.assertEqual(self.run_logs("0").kwargs["tail"], 0)
+            self.assertEqual(self.run_logs(None).kwargs["tail"], "all")
+
+    def test_daemon_down(self):
+        options = {
+            "<apps>": ["app"],
+            "--archive": False,
+            "--grep": "x",
+            "--latest": False,
+            "--follow": False,
+            "--minutes": None,
+            "--lines": None,
+        }
+        with mock.patch.object(
+            Stack, "get_docker_client", return_value=FakeClient(None)
+        ), mock.patch.object(App, "get_container_name", return_value=None):
+            with self.assertLogs("stack", "CRITICAL"), self.assertRaises(SystemExit):
+                Logs(options).run()
+
+    def test_bad_lines(self):
+        for lines in ("ten", "-1"):
+            with self.assertLogs("stack", "ERROR"), self.assertRaises(SystemExit):
+                self.run_logs(lines)
@@ -0,0 +1,185 @@
+"""Tests for redeploying packages to the apps depending on them."""
+
+
+import io
+import os
+import sys
+import tarfile
+import time
+from unittest import mock
+
+from stack import client
+from stack.commands.packages import Packages
+from stack.config import StackConfig
+from stack.snapshot import PROJECT_LABEL
+from support import StackTestCase
+
+COMPOSE = """
+services:
+  app:
+    container_name: app-stack
+    image: app
+  api:
+    container_name: api-stack
+    image: api
+  web:
+    container_name: web-stack
+    image: web
+"""
+
+STACK = """
+stack:
+  name: test
+  apps:
+    app:
+      packages: [package]
+    api:
+      packages: [package, other]
+    web:
+      packages: [other]
+"""
+
+
+class TestUpdateApps(StackTestCase):
+    compose = COMPOSE
+    stack = STACK
+    outputs = {
+        name: ([(b"Successfully installed package\n", None)], 0)
+        for name in ("app-stack", "api-stack", "web-stack")
+    }
+
+    def test_update_apps(self):
+        with self.assertLogs("stack", "INFO"):
+            self.assertTrue(Packages.update_apps("package"))
+
+        # One exec per dependent app, from a single container listing
+        api = client._client.api
+        command = ["pip", "install", "--force-reinstall", "--no-deps", "package"]
+        self.assertEqual(
+            sorted(api.execs), [("api-stack", command), ("app-stack", command)]
+        )
+        self.assertIn(PROJECT_LABEL, api.filters["label"])
+
+    def test_direct(self):
+        wheel = os.path.join(self.root, "package-1.0-py3-none-any.whl")
+        with open(wheel, "wb") as f:
+            f.write(b"wheel")
+
+        with self.assertLogs("stack", "INFO"):
+            self.assertTrue(Packages.update_apps("package", wheel))
+
+        # The wheel is copied in and installed from its path
+        api = client._client.api
+        self.assertEqual(sorted(api.archives), ["api-stack", "app-stack"])
+        path, data = api.archives["app-stack"]
+        with tarfile.open(fileobj=io.BytesIO(data)) as tar:
+            member = tar.getmember(os.path.basename(wheel))
+            self.assertEqual(tar.extractfile(member).read(), b"wheel")
+
+        command = ["pip", "install", "--force-reinstall", "--no-deps"]
+        self.assertIn(("app-stack", command + [path + "/" + member.name]), api.execs)
+
+
+# Builds a wheel of the package in the current directory, logging the order
+BUILD = """
+import os
+import sys
+import time
+
+name = os.path.basename(os.getcwd())
+with open(os.path.join("..", "builds.log"), "a") as f:
+    f.write("start " + name + "\\n")
+time.sleep(0.1)
+os.makedirs("dist", exist_ok=True)
+with open(os.path.join("dist", name + "-1.0-py3-none-any.whl"), "w") as f:
+    f.write(name)
+with open(os.path.join("..", "builds.log"), "a") as f:
+    f.write("end " + name + "\\n")
+"""
+
+PACKAGES = """
+stack:
+  name: test
+  packages:
+    - name: core
+      path: packages/core
+      build: {build}
+    - name: plugin
+      path: packages/plugin
+      build: {build}
+      depends_on: [core]
+    - name: other
+      path: packages/other
+      build: {build}
+"""
+
+
+class TestUpdateMany(StackTestCase):
+    def setUp(self):
+        super().setUp()
+        for name in ("core", "plugin", "other"):
+            os.makedirs(os.path.join("packages", name))
+            self.write(os.path.join("packages", name, "setup.py"), "")
+        self.write(os.path.join("packages", "build.py"), BUILD)
+        build = "{} {}".format(
+            sys.executable, os.path.join(self.root, "packages", "build.py")
+        )
+        self.write("stack.yml", PACKAGES.format(build=build))
+        StackConfig.invalidate()
+
+    def update_many(self, **kwargs):
+        with mock.patch.object(Packages, "upload", return_value=True):
+            with self.assertLogs("stack", "INFO") as logs:
+                outcomes = Packages.update_many(["core", "plugin", "other"], **kwargs)
+
+        self.assertIn("Upload", logs.output[-4])
+        return {package: outcome["result"] for package, outcome in outcomes.items()}
+
+    def test_ordered(self):
+        self.update_many(direct=True, concurrency=2)
+        with open(os.path.join("packages", "builds.log")) as f:
+            builds = f.read().splitlines()
+
+        # The dependency was built first, the other package alongside it
+        self.assertLess(builds.index("end core"), builds.index("start plugin"))
+        self.assertLess(builds.index("start other"), builds.index("end core"))
+
+    def test_unchanged(self):
+        results = self.update_many()
+        self.assertEqual(set(results.values()), {"uploaded"})
+        results = self.update_many()
+        self.assertEqual(set(results.values()), {"unchanged"})
+
+        # Only the changed package is built again, unless forced
+        self.write(os.path.join("packages", "core", "setup.py"), "# Changed")
+        results = self.update_many()
+        self.assertEqual(results["core"], "uploaded")
+        self.assertEqual(results["plugin"], "unchanged")
+        results = self.update_many(force=True)
+        self.assertEqual(set(results.values()), {"uploaded"})
+
+    def test_wheel(self):
+        # A wheel of another version is left over, written after the build's
+        dist = os.path.join("packages", "core", "dist")
+        os.makedirs(dist)
+        stale = os.path.join(dist, "core-2.0-py3-none-any.whl")
+        self.write(stale, "stale")
+        os.utime(stale, (time.time() + 60, time.time() + 60))
+
+        outcome = Packages.update("core", direct=True)
+        self.assertEqual(outcome["result"], "built")
+        self.assertEqual(
+            outcome["wheel"],
+            os.path.join(self.root, dist, "core-1.0-py3-none-any.whl"),
+        )
+
+    def test_build_outputs(self):
+        config = {"path": os.path.join("packages", "core"), "build": "build"}
+        fingerprint, files = Packages.fingerprint(config)
+
+        # What building writes, however deep, does not change the fingerprint
+        for path in ("src/pkg.egg-info/PKG-INFO", "src/pkg/__pycache__/a.pyc"):
+            path = os.path.join("packages", "core", path)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            self.write(path, "")
+        self.assertEqual(Packages.fingerprint(config, files)[0], fingerprint)
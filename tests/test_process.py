@@ -0,0 +1,114 @@
+"""Tests for running subprocesses."""
+
+
+import sys
+import time
+from logging import DEBUG, ERROR
+from unittest import TestCase
+
+from stack import process
+
+# Fills the stderr pipe several times over before writing to stdout
+CHILD = """
+import sys
+sys.stderr.write(("e" * 99 + "\\n") * 20001)
+sys.stdout.write("first\\nsecond\\nno newline")
+sys.exit(3)
+"""
+
+
+class TestLineSplitter(TestCase):
+    def test_split(self):
+        splitter = process.LineSplitter()
+        self.assertEqual(splitter.feed(b"one\ntw"), [b"one"])
+        self.assertEqual(splitter.feed(b"o"), [])
+        self.assertEqual(splitter.feed(b"\nthree\n\nfour"), [b"two", b"three", b""])
+        self.assertEqual(splitter.flush(), [b"four"])
+        self.assertEqual(splitter.flush(), [])
+
+
+class TestStream(TestCase):
+    def test_stream(self):
+        output = {DEBUG: [], ERROR: []}
+
+        def handler(level, lines):
+            output[level].extend(lines)
+
+        code = process.stream([sys.executable, "-c", CHILD], handler)
+        self.assertEqual(code, 3)
+        self.assertEqual(output[DEBUG], [b"first", b"second", b"no newline"])
+        self.assertEqual(len(output[ERROR]), 20001)
+
+    def test_run(self):
+        self.assertEqual(process.run([sys.executable, "-c", "print('ok')"]), 0)
+        self.assertEqual(
+            process.run([sys.executable, "-c", "exit(2)"], passthrough=True), 2
+        )
+
+
+class TestRunMany(TestCase):
+    def test_run_many(self):
+        sleep = [sys.executable, "-c", "import time; time.sleep(0.5)"]
+        commands = [("sleep-{}".format(i), sleep) for i in range(4)]
+        commands.append(("fail", [sys.executable, "-c", "exit(4)"]))
+
+        start = time.monotonic()
+        results = process.run_many(commands, concurrency=5)
+        elapsed = time.monotonic() - start
+
+        self.assertEqual([r.name for r in results], [c[0] for c in commands])
+        self.assertEqual([r.code for r in results], [0, 0, 0, 0, 4])
+
+        # They should have run at the same time
+        self.assertLess(elapsed, 1.5)
+
+    def test_missing_command(self):
+        commands = [
+            ("missing", ["stack-command-that-does-not-exist"]),
+            ("ok", [sys.executable, "-c", "pass"]),
+        ]
+        with self.assertLogs("stack", "ERROR"):
+            results = process.run_many(commands)
+
+        self.assertEqual([r.code for r in results], [127, 0])
+
+    def test_prefixed_output(self):
+        with self.assertLogs("stack", level=DEBUG) as logs:
+            process.run_many(
+                [("app", [sys.executable, "-c", "print('one'); print('two')"])]
+            )
+
+        lines = "\n".join(r.getMessage() for r in logs.records).split("\n")
+        self.assertEqual(len(lines), 2)
+        self.assertTrue(all("(app)" in line for line in lines))
+        self.assertTrue(lines[1].endswith(" two"))
+
+
+class TestRunGraph(TestCase):
+    def test_order(self):
+        order = []
+
+        def worker(item):
+            order.append(item)
+            return item != "broken"
+
+        dependencies = {
+            "app": {"base", "stackdb"},
+            "base": set(),
+            "other": {"broken"},
+            "last": {"other"},
+        }
+        results = process.run_graph(
+            ["app", "base", "broken", "other", "last"], dependencies, worker
+        )
+
+        self.assertLess(order.index("base"), order.index("app"))
+        self.assertEqual(results["app"].code, 0)
+        self.assertEqual(results["broken"].code, 1)
+        self.assertIsNone(results["other"].code)
+        self.assertIsNone(results["last"].code)
+        self.assertNotIn("other", order)
+
+    def test_cycle(self):
+        with self.assertRaises(ValueError):
+            process.run_graph(["a", "b"], {"a": {"b"}, "b": {"a"}}, bool)
@@ -0,0 +1,106 @@
+"""Tests for waiting on containers to be healthy."""
+
+
+from unittest import TestCase, mock
+
+from stack import readiness
+from stack.app import Stack
+from stack.commands.reup import Reup
+
+
+class FakeEvents(object):
+    def __init__(self, events):
+        self.events = iter(events)
+        self.closed = False
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        return next(self.events)
+
+    def close(self):
+        self.closed = True
+
+
+class FakeAPI(object):
+    def __init__(self, states):
+        self.states = states
+
+    def inspect_container(self, name):
+        return {"State": self.states[name]}
+
+
+class FakeClient(object):
+    def __init__(self, states, events):
+        self.api = FakeAPI(states)
+        self.stream = FakeEvents(events)
+
+    def events(self, **kwargs):
+        self.kwargs = kwargs
+        return self.stream
+
+
+def event(action, name):
+    return {
+        "Type": "container",
+        "Action": action,
+        "Actor": {"Attributes": {"name": name}},
+    }
+
+
+class TestWait(TestCase):
+    def test_wait(self):
+        states = {
+            "app-stack": {"Running": True, "Health": {"Status": "starting"}},
+            "db-stack": {"Running": True, "Health": {"Status": "healthy"}},
+            "mail-stack": {"Running": True},
+        }
+        client = FakeClient(
+            states,
+            [
+                event("exec_start", "app-stack"),
+                event("health_status: healthy", "app-stack"),
+                event("die", "db-stack"),
+            ],
+        )
+
+        containers = {"app": "app-stack", "db": "db-stack", "mail": "mail-stack"}
+        results = readiness.wait(client, containers, timeout=10)
+
+        self.assertEqual(results["app"][0], "healthy")
+        self.assertEqual(results["db"][0], "healthy")
+        self.assertEqual(results["mail"][0], "running")
+        self.assertTrue(all(elapsed is not None for _, elapsed in results.values()))
+
+        # It stops reading events once everything is ready
+        self.assertEqual(next(client.stream)["Action"], "die")
+        self.assertTrue(client.stream.closed)
+        self.assertEqual(sorted(client.kwargs["filters"]["container"]), sorted(states))
+
+    def test_timeout(self):
+        states = {"app-stack": {"Running": False, "Status": "exited"}}
+        client = FakeClient(states, [event("start", "other-stack")])
+
+        results = readiness.wait(client, {"app": "app-stack"}, timeout=10)
+        self.assertEqual(results["app"], ("exited", None))
+
+
+class TestReup(TestCase):
+    def reup(self, code):
+        options = {"--clean": False, "<app>": None, "-d": True, "--timeout": "5"}
+        with mock.patch.object(Stack, "run", return_value=code) as run:
+            with mock.patch.object(Stack, "hook") as hook:
+                Reup(options).run()
+
+        return run, hook
+
+    def test_hooks_left_to_up(self):
+        # stack up waits and runs the hooks itself
+        run, hook = self.reup(0)
+        self.assertEqual(run.call_args[0][0], ["stack", "up", "-d", "--timeout=5.0"])
+        hook.assert_not_called()
+
+    def test_up_failed(self):
+        with self.assertLogs("stack", "ERROR"), self.assertRaises(SystemExit):
+            self.reup(1)
@@ -0,0 +1,152 @@
+"""Tests for the container and image snapshot."""
+
+
+import os
+import shutil
+import tempfile
+from unittest import TestCase, mock
+
+from stack.snapshot import Snapshot
+
+CONTAINERS = [
+    {
+        "Id": "1",
+        "Names": ["/app-stack"],
+        "State": "running",
+        "Status": "Up 2 hours (healthy)",
+        "Labels": {"com.docker.compose.service": "app"},
+    },
+    {
+        "Id": "2",
+        "Names": ["/stack_mail_1"],
+        "State": "exited",
+        "Status": "Exited (0) 5 minutes ago",
+        "Labels": {"com.docker.compose.service": "mail"},
+    },
+    {
+        "Id": "3",
+        "Names": ["/stackdb-stack"],
+        "State": "running",
+        "Status": "Up 10 seconds (health: starting)",
+        "Labels": {"com.docker.compose.service": "stackdb"},
+    },
+]
+
+IMAGES = [
+    {"Id": "a", "RepoTags": ["stack/app:latest"]},
+    {"Id": "b", "RepoTags": ["mysql:5.7"]},
+    {"Id": "c", "RepoTags": None},
+]
+
+
+class FakeAPI(object):
+    def __init__(self):
+        self.calls = []
+
+    def containers(self, **kwargs):
+        self.calls.append(("containers", kwargs))
+        return CONTAINERS
+
+    def images(self, **kwargs):
+        self.calls.append(("images", kwargs))
+        return IMAGES
+
+
+class FakeClient(object):
+    def __init__(self):
+        self.api = FakeAPI()
+
+
+class TestSnapshot(TestCase):
+    def test_take(self):
+        client = FakeClient()
+        snapshot = Snapshot.take(client, project="stack")
+
+        # One request for each
+        self.assertEqual(
+            [call[0] for call in client.api.calls], ["containers", "images"]
+        )
+        self.assertEqual(
+            client.api.calls[0][1]["filters"],
+            {"label": "com.docker.compose.project=stack"},
+        )
+
+        # Containers by name and service
+        app = snapshot.get_container("app-stack")
+        self.assertIs(snapshot.get_container("app"), app)
+        self.assertEqual(app.status, "running")
+        self.assertEqual(app.health, "healthy")
+        self.assertEqual(app.uptime, "2 hours")
+        self.assertEqual(snapshot.get_container("stackdb").health, "starting")
+        self.assertEqual(snapshot.get_container("stackdb").uptime, "10 seconds")
+        self.assertIsNone(snapshot.get_container("mail").uptime)
+        self.assertIsNone(snapshot.get_container("missing"))
+
+        # Images by tag
+        self.assertTrue(snapshot.has_image("stack/app"))
+        self.assertTrue(snapshot.has_image("mysql:5.7"))
+        self.assertFalse(snapshot.has_image("mysql"))
+
+    def test_project_name(self):
+        cwd = os.getcwd()
+        directory = tempfile.mkdtemp(suffix="My.Stack")
+        os.chdir(directory)
+        try:
+            with mock.patch.dict(os.environ):
+                os.environ.pop("COMPOSE_PROJECT_NAME", None)
+                name = os.path.basename(directory).lower().replace(".", "")
+                self.assertEqual(Snapshot.get_project_name(), name)
+
+                # docker-compose reads it from the .env file too
+                with open(".env", "w") as f:
+                    f.write("# Secrets\nDB_PASSWORD=x=y\nCOMPOSE_PROJECT_NAME='dbmi'\n")
+                self.assertEqual(Snapshot.get_project_name(), "dbmi")
+
+                # The environment comes first
+                os.environ["COMPOSE_PROJECT_NAME"] = "other"
+                self.assertEqual(Snapshot.get_project_name(), "other")
+
+        finally:
+            os.chdir(cwd)
+            shutil.rmtree(directory)
+
+    def test_apply_event(self):
+        snapshot = Snapshot(CONTAINERS, IMAGES)
+
+        def event(action, name, id, service=None):
+            attributes = {"name": name}
+            if service:
+                attributes["com.docker.compose.service"] = service
+
+            return {
+                "Type": "container",
+                "Action": action,
+                "id": id,
+                "time": 0,
+                "Actor": {"Attributes": attributes},
+            }
+
+        # Health and status transitions
+        snapshot.apply_event(event("health_status: healthy", "stackdb-stack", "3"))
+        self.assertEqual(snapshot.get_container("stackdb").health, "healthy")
+        snapshot.apply_event(event("die", "app-stack", "1"))
+        self.assertEqual(snapshot.get_container("app").status, "exited")
+        self.assertIsNone(snapshot.get_container("app").health)
+
+        # A recreated container replaces the old one
+        snapshot.apply_event(event("create", "app-stack", "4"))
+        snapshot.apply_event(event("start", "app-stack", "4"))
+        self.assertEqual(snapshot.get_container("app-stack").id, "4")
+        self.assertEqual(snapshot.get_container("app-stack").status, "running")
+
+        # So does one recreated under a new ID without a container_name
+        snapshot.apply_event(event("destroy", "stack_mail_1", "2", "mail"))
+        self.assertEqual(snapshot.get_container("mail").status, "removed")
+        snapshot.apply_event(event("create", "stack_mail_1", "5", "mail"))
+        snapshot.apply_event(event("start", "stack_mail_1", "5", "mail"))
+        self.assertEqual(snapshot.get_container("mail").id, "5")
+        self.assertEqual(snapshot.get_container("mail").status, "running")
+
+        # Unrelated events are ignored
+        self.assertIsNone(snapshot.apply_event({"Type": "network", "Action": "x"}))
+        self.assertIsNone(snapshot.apply_event(event("exec_start", "app-stack", "4")))
@@ -0,0 +1,202 @@
+"""Tests for updating the apps' git subtrees."""
+
+import os
+import shutil
+import subprocess
+import tempfile
+from unittest import TestCase, mock
+
+from stack import subtree
+from stack.commands.checkout import Checkout
+from stack.commands.update import Update
+from stack.config import StackConfig
+
+STACK = """
+stack:
+  name: test
+  apps-directory: apps
+  apps:
+{apps}
+"""
+
+APP = """
+    {app}:
+      repository: {url}
+      branch: development
+"""
+
+# Commits made by the tests
+IDENTITY = {
+    "GIT_AUTHOR_NAME": "Stack",
+    "GIT_AUTHOR_EMAIL": "stack@example.com",
+    "GIT_COMMITTER_NAME": "Stack",
+    "GIT_COMMITTER_EMAIL": "stack@example.com",
+}
+
+
+def git(*args, cwd=None):
+    return subprocess.check_output(("git",) + args, cwd=cwd).decode().strip()
+
+
+class TestUpdate(TestCase):
+    def setUp(self):
+        self.cwd = os.getcwd()
+        self.root = tempfile.mkdtemp()
+        self.environ = mock.patch.dict(os.environ, IDENTITY)
+        self.environ.start()
+
+        # A bare repository for each app, and one that does not exist
+        self.remotes = {}
+        for app in ("app", "api"):
+            self.remotes[app] = self.make_remote(app, {"README": app})
+        self.remotes["missing"] = os.path.join(self.root, "missing.git")
+
+        self.stack = os.path.join(self.root, "stack")
+        os.makedirs(self.stack)
+        os.chdir(self.stack)
+        apps = "".join(
+            APP.format(app=app, url=url) for app, url in self.remotes.items()
+        )
+        self.write("stack.yml", STACK.format(apps=apps))
+        services = "".join(
+            "  {0}:\n    image: {0}\n".format(app) for app in self.remotes
+        )
+        self.write("docker-compose.yml", "services:\n" + services)
+        git("init", "--quiet")
+        git("add", ".")
+        git("commit", "--quiet", "-m", "Stack")
+        StackConfig.invalidate()
+
+    def tearDown(self):
+        os.chdir(self.cwd)
+        self.environ.stop()
+        shutil.rmtree(self.root)
+
+    def write(self, path, content):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(content)
+
+    def make_remote(self, app, files):
+        """Returns the URL of a bare repository with the files committed"""
+        work = os.path.join(self.root, "work", app)
+        os.makedirs(work)
+        git("init", "--quiet", "--initial-branch=development", cwd=work)
+        for path, content in files.items():
+            self.write(os.path.join(work, path), content)
+        git("add", ".", cwd=work)
+        git("commit", "--quiet", "-m", "Initial", cwd=work)
+
+        url = os.path.join(self.root, app + ".git")
+        git("clone", "--quiet", "--bare", work, url)
+        return url
+
+    def test_fetch_many(self):
+        repositories = {app: (url, "development") for app, url in self.remotes.items()}
+        with self.assertLogs("stack", "ERROR"):
+            fetched = subtree.fetch_many(repositories)
+
+        self.assertEqual(fetched, {"app", "api"})
+        self.assertEqual(
+            git("rev-parse", subtree.get_ref("app")),
+            git("rev-parse", "development", cwd=self.remotes["app"]),
+        )
+
+        # The concurrent fetches do not race to write FETCH_HEAD
+        self.assertFalse(os.path.exists(os.path.join(".git", "FETCH_HEAD")))
+
+    def test_old_git(self):
+        # Git before 2.29 does not know the option
+        with mock.patch.object(subtree, "get_git_version", return_value=(2, 25)):
+            command = subtree.fetch("app", self.remotes["app"], "development")
+        self.assertNotIn("--no-write-fetch-head", command)
+        self.assertIn("--no-write-fetch-head", subtree.fetch("app", "url", "main"))
+
+    def test_update(self):
+        with self.assertLogs("stack", "INFO"):
+            Update({"<app>": None, "--jobs": None}).run()
+
+        for app in ("app", "api"):
+            with open(os.path.join("apps", app, "README")) as f:
+                self.assertEqual(f.read(), app)
+        self.assertFalse(os.path.exists(os.path.join("apps", "missing")))
+        self.assertIn("git-subtree-dir: apps/app", git("log", "--format=%B"))
+        self.assertEqual(
+            subtree.get_splits(),
+            {
+                os.path.join("apps", app): git(
+                    "rev-parse", "development", cwd=self.remotes[app]
+                )
+                for app in ("app", "api")
+            },
+        )
+
+    def test_up_to_date(self):
+        with self.assertLogs("stack", "INFO"):
+            Update({"<app>": None, "--jobs": None}).run()
+        head = git("rev-parse", "HEAD")
+        self.assertEqual(
+            subtree.get_split("apps/app"),
+            git("rev-parse", "development", cwd=self.remotes["app"]),
+        )
+
+        # Nothing changed upstream, so nothing is fetched or committed
+        with self.assertLogs("stack", "INFO") as logs:
+            Update({"<app>": None, "--jobs": None}).run()
+        self.assertEqual(git("rev-parse", "HEAD"), head)
+        self.assertIn("updated: 0, already up to date: 2", logs.output[-1])
+
+        # Only the app whose branch moved is updated
+        work = os.path.join(self.root, "work", "app")
+        self.write(os.path.join(work, "README"), "changed")
+        git("commit", "--quiet", "-am", "Change", cwd=work)
+        git("push", "--quiet", self.remotes["app"], "development", cwd=work)
+        with self.assertLogs("stack", "INFO") as logs:
+            Update({"<app>": None, "--jobs": None}).run()
+        self.assertIn("updated: 1, already up to date: 1", logs.output[-1])
+        with open(os.path.join("apps", "app", "README")) as f:
+            self.assertEqual(f.read(), "changed")
+
+    def test_switch(self):
+        with self.assertLogs("stack", "INFO"):
+            Update({"<app>": None, "--jobs": None}).run()
+
+        # A branch changing one file, adding one and removing one
+        work = os.path.join(self.root, "work", "app")
+        self.write(os.path.join(work, "keep"), "keep")
+        self.write(os.path.join(work, "remove"), "remove")
+        git("add", ".", cwd=work)
+        git("commit", "--quiet", "-m", "Files", cwd=work)
+        git("push", "--quiet", self.remotes["app"], "development", cwd=work)
+        with self.assertLogs("stack", "INFO"):
+            Update({"<app>": "app", "--jobs": None}).run()
+
+        git("checkout", "--quiet", "-b", "feature", cwd=work)
+        self.write(os.path.join(work, "README"), "feature")
+        self.write(os.path.join(work, "add"), "add")
+        git("rm", "--quiet", "remove", cwd=work)
+        git("add", ".", cwd=work)
+        git("commit", "--quiet", "-m", "Feature", cwd=work)
+        git("push", "--quiet", self.remotes["app"], "feature", cwd=work)
+
+        # Files that do not change are left alone
+        keep = os.path.join("apps", "app", "keep")
+        os.utime(keep, (1000000000, 1000000000))
+        git("update-index", "--refresh")
+        before = git("rev-parse", "HEAD")
+        Checkout({"<app>": "app", "<branch>": "feature", "-b": False}).run()
+
+        self.assertEqual(os.stat(keep).st_mtime, 1000000000)
+        with open(os.path.join("apps", "app", "README")) as f:
+            self.assertEqual(f.read(), "feature")
+        self.assertTrue(os.path.exists(os.path.join("apps", "app", "add")))
+        self.assertFalse(os.path.exists(os.path.join("apps", "app", "remove")))
+        self.assertEqual(git("status", "--porcelain", "--untracked-files=no"), "")
+
+        # One merge of one squash commit, and no removal commits
+        self.assertEqual(git("rev-parse", "HEAD^1"), before)
+        self.assertEqual(git("rev-list", "--count", "{}..HEAD".format(before)), "2")
+        self.assertEqual(
+            subtree.get_split("apps/app"),
+            git("rev-parse", "feature", cwd=self.remotes["app"]),
+        )
@@ -0,0 +1,136 @@
+"""Tests for uploading distributions to the package index."""
+
+import os
+import shutil
+import tempfile
+import threading
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from socketserver import ThreadingMixIn
+from unittest import TestCase
+
+from stack import upload
+
+
+class StubIndex(ThreadingMixIn, HTTPServer):
+    """An index that has one file of the project, and records uploads"""
+
+    daemon_threads = True
+
+    def __init__(self):
+        HTTPServer.__init__(self, ("127.0.0.1", 0), StubIndexHandler)
+        self.existing = ["my-package-1.0.tar.gz"]
+        self.queries = []
+        self.uploads = {}
+        self.connections = set()
+
+    @property
+    def url(self):
+        return "http://127.0.0.1:{}/root/public/".format(self.server_address[1])
+
+
+class StubIndexHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.queries.append(self.path)
+        self.server.connections.add(self.client_address)
+        if self.path != "/root/public/+simple/my-package/":
+            return self.respond(404)
+
+        links = "".join(
+            '<a href="../../+f/abc/{0}#sha256=abc">{0}</a>'.format(name)
+            for name in self.server.existing
+        )
+        self.respond(200, "<html><body>{}</body></html>".format(links).encode())
+
+    def do_POST(self):
+        self.server.connections.add(self.client_address)
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        fields = {}
+        boundary = self.headers["Content-Type"].split("boundary=")[1].encode()
+        for part in body.split(b"--" + boundary)[1:-1]:
+            head, _, value = part[2:-2].partition(b"\r\n\r\n")
+            name = head.split(b'name="')[1].split(b'"')[0].decode()
+            fields[name] = value
+
+        if self.path != "/root/public/":
+            return self.respond(403)
+
+        self.server.uploads[fields["content"]] = fields
+        self.respond(200)
+
+    def respond(self, code, body=b""):
+        self.send_response(code)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class TestUploader(TestCase):
+    def setUp(self):
+        self.index = StubIndex()
+        thread = threading.Thread(target=self.index.serve_forever)
+        thread.daemon = True
+        thread.start()
+
+        self.directory = tempfile.mkdtemp()
+        self.dists = []
+        for name in (
+            "my_package-1.0-py3-none-any.whl",
+            "my-package-1.0.tar.gz",
+            "my_package-1.1-py2.py3-none-any.whl",
+            "my-package-1.1.tar.gz",
+            "README.txt",
+        ):
+            self.dists.append(os.path.join(self.directory, name))
+            with open(self.dists[-1], "wb") as f:
+                f.write(name.encode() * 10000)
+
+    def tearDown(self):
+        self.index.shutdown()
+        self.index.server_close()
+        shutil.rmtree(self.directory)
+
+    def test_parse_filename(self):
+        self.assertEqual(
+            upload.parse_filename("my_package-1.1-py2.py3-none-any.whl"),
+            ("my_package", "1.1", "bdist_wheel", "py2.py3"),
+        )
+        self.assertEqual(
+            upload.parse_filename("my-package-1.1.tar.gz"),
+            ("my-package", "1.1", "sdist", "source"),
+        )
+        self.assertIsNone(upload.parse_filename("README.txt"))
+
+    def test_upload(self):
+        uploader = upload.Uploader(self.index.url, "root", "secret", concurrency=2)
+        with self.assertLogs("stack", "INFO"):
+            self.assertTrue(uploader.upload(self.dists))
+        uploader.close()
+
+        # The index was asked once, and only new distributions were sent
+        self.assertEqual(self.index.queries, ["/root/public/+simple/my-package/"])
+        self.assertEqual(len(self.index.uploads), 3)
+        for path in self.dists[:1] + self.dists[2:4]:
+            with open(path, "rb") as f:
+                fields = self.index.uploads[f.read()]
+            self.assertEqual(fields[":action"], b"file_upload")
+            self.assertEqual(fields["sha256_digest"], upload.hash_file(path).encode())
+
+        # Connections were reused
+        self.assertLessEqual(len(self.index.connections), 2)
+
+    def test_pool_size(self):
+        # Every file being sent by every job gets its own connection
+        uploader = upload.Uploader(self.index.url, "root", "secret", 2, jobs=3)
+        self.assertEqual(uploader.pool_size, 6)
+        self.assertEqual(uploader.session.get_adapter(self.index.url)._pool_maxsize, 6)
+        uploader.close()
+
+    def test_failure(self):
+        uploader = upload.Uploader(self.index.url + "other/", "root", "secret")
+        with self.assertLogs("stack", "ERROR"):
+            self.assertFalse(uploader.upload(self.dists[:1]))